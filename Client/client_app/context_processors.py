@@ -1,5 +1,21 @@
+from django.conf import settings
+
+from .grpc_client import pop_query_stats
+
+
 def global_images(request):
     return {
         'logo_image': "book_covers/ismac_logo.png",
         'bg_image': "book_covers/Background.jpg"
-    }
\ No newline at end of file
+    }
+
+
+def rpc_query_stats(request):
+    """En DEBUG : requêtes SQL exécutées par le serveur pour chaque RPC de la page."""
+    if not settings.DEBUG:
+        return {}
+    stats = pop_query_stats()
+    return {
+        'rpc_query_stats': stats,
+        'rpc_query_total': sum(count for _, count, _ in stats),
+    }
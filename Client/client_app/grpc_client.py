@@ -1,8 +1,15 @@
 # In Client/client_app/grpc_client.py
 
 import grpc
+import collections
+import contextvars
+import itertools
+import json
 import sys
 import os
+import threading
+import time
+import uuid
 
 # ----------------------------------------------------
 # 1. PYTHON PATH FIX (CRITICAL for Django Client)
@@ -18,16 +25,665 @@ sys.path.insert(0, project_root_client)
 
 import library_pb2
 import library_pb2_grpc
+from google.protobuf import field_mask_pb2
 
 SERVER_ADDRESS = 'localhost:50051' 
 
+# Pagination par curseur : taille de page par défaut des écrans de liste et
+# clé des trailing metadata où le serveur place le curseur suivant.
+PAGE_SIZE = 50
+NEXT_PAGE_TOKEN_KEY = 'next-page-token'
+# Identifiants envoyés par appel de GetBooks / GetMembers (le serveur en accepte 1000).
+IDS_PER_CALL = 500
+
+
+def _next_page_token(call):
+    """Lit le curseur de la page suivante une fois le flux consommé."""
+    for key, value in call.trailing_metadata() or ():
+        if key == NEXT_PAGE_TOKEN_KEY:
+            return value
+    return ""
+
+
+def new_request_id():
+    """Clé d'idempotence d'une mutation (BorrowBook, ReturnBook, CreateBook)."""
+    return uuid.uuid4().hex
+
+
+def _field_mask(fields):
+    """FieldMask des champs `fields` ; None (masque vide) désigne tous les champs."""
+    return field_mask_pb2.FieldMask(paths=list(fields or ()))
+
+# ----------------------------------------------------
+# 3. SHARED CHANNEL POOL
+# ----------------------------------------------------
+
+# Nombre de connexions HTTP/2 ouvertes par processus worker. Chaque canal
+# multiplexe déjà de nombreux appels ; plusieurs canaux évitent seulement
+# de plafonner sur la limite de flux concurrents d'une seule connexion.
+CHANNEL_POOL_SIZE = int(os.environ.get('LIBRARY_GRPC_POOL_SIZE', '2'))
+
+CHANNEL_OPTIONS = [
+    # Keepalive : détecte une connexion morte (redémarrage serveur, NAT)
+    # avant qu'une vue ne l'utilise, même sans appel en cours.
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.keepalive_timeout_ms', 10000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    # Reconnexion rapide après une coupure ou une période d'inactivité.
+    ('grpc.initial_reconnect_backoff_ms', 100),
+    ('grpc.min_reconnect_backoff_ms', 100),
+    ('grpc.max_reconnect_backoff_ms', 5000),
+    # Un sous-canal (donc une connexion TCP) propre à chaque canal du pool.
+    ('grpc.use_local_subchannel_pool', 1),
+    # Nouvelles tentatives automatiques (voir SERVICE_CONFIG, section 4).
+    ('grpc.enable_retries', 1),
+]
+
+
+class ChannelPool:
+    """
+    Process-wide pool of long-lived gRPC channels.
+
+    Channels are created lazily, shared by every LibraryClient of the
+    process and handed out round-robin. After a fork (gunicorn/uWSGI
+    pre-fork workers) the child starts with a fresh pool, since gRPC
+    channels cannot be used across processes.
+    """
+    def __init__(self, address, size=CHANNEL_POOL_SIZE, options=CHANNEL_OPTIONS):
+        self.address = address
+        self.size = max(1, size)
+        self.options = list(options) + [('grpc.service_config', SERVICE_CONFIG)]
+        self._lock = threading.Lock()
+        self._pid = None
+        self._channels = []
+        self._stubs = []
+        self._counter = itertools.count()
+
+    def _ensure_open(self):
+        if self._pid == os.getpid() and self._channels:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._channels:
+                return
+            channels = []
+            for _ in range(self.size):
+                channel = grpc.insecure_channel(self.address, options=self.options)
+                # Ouvre la connexion dès maintenant : la première vue ne paie pas l'établissement.
+                # Après une panne, gRPC continue de se reconnecter et le retour à READY
+                # déclenche l'appel d'essai des circuits ouverts (section 5).
+                channel.subscribe(CIRCUIT_BREAKERS.on_connectivity, try_to_connect=True)
+                channels.append(channel)
+            self._channels = channels
+            interceptors = [DeadlineInterceptor(), SessionTokenInterceptor()]
+            if BREAKER_FAILURES > 0:
+                interceptors.insert(0, CircuitBreakerInterceptor())
+            if _query_stats_enabled():
+                interceptors.append(QueryStatsInterceptor())
+            channels = [grpc.intercept_channel(c, *interceptors) for c in channels]
+            self._stubs = [library_pb2_grpc.LibraryServiceStub(c) for c in channels]
+            self._pid = os.getpid()
+
+    def get(self):
+        """Retourne un couple (canal, stub) du pool."""
+        self._ensure_open()
+        index = next(self._counter) % self.size
+        return self._channels[index], self._stubs[index]
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                for channel in self._channels:
+                    channel.close()
+            self._channels, self._stubs, self._pid = [], [], None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_channel_pool():
+    """Pool partagé du processus, créé au premier appel."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ChannelPool(SERVER_ADDRESS)
+    return _pool
+
+
+# ----------------------------------------------------
+# 4. DEADLINES, RETRIES & HEDGING
+# ----------------------------------------------------
+
+# Délai (s) appliqué à chaque appel qui n'en fixe pas : un serveur bloqué rend
+# la main à la vue au lieu d'immobiliser le worker Django indéfiniment.
+DEFAULT_DEADLINE = float(os.environ.get('LIBRARY_GRPC_DEADLINE', '5'))
+METHOD_DEADLINES = {
+    'GetBook': 1.0, 'GetBooks': 2.0, 'GetMemberDetail': 1.0, 'GetMembers': 2.0, 'GetUserDetail': 1.0,
+    'GetLibraryStats': 2.0,
+    # Flux complets (catalogue, membres) et imports.
+    'SearchBooks': 30.0, 'SearchBooksBatched': 120.0, 'GetAllMembers': 30.0, 'GetAllMembersBatched': 120.0,
+    'GetAllUsers': 10.0, 'CreateBooks': 300.0,
+    # Abonnement de longue durée : pas de délai.
+    'WatchAvailability': None,
+}
+
+# Appels rejoués par gRPC sur UNAVAILABLE (tant qu'aucune réponse n'est reçue) :
+# les lectures, et les mutations protégées par un request_id (idempotentes).
+RETRYABLE_METHODS = (
+    'SearchBooks', 'SearchBooksBatched', 'GetBook', 'GetBooks', 'GetMemberDetail', 'GetMembers',
+    'GetAllMembers', 'GetAllMembersBatched', 'GetAllUsers', 'GetUserDetail', 'GetLibraryStats',
+    'BorrowBook', 'ReturnBook', 'CreateBook',
+)
+SERVICE_CONFIG = json.dumps({
+    'methodConfig': [{
+        'name': [{'service': 'library_system.LibraryService', 'method': method} for method in RETRYABLE_METHODS],
+        'retryPolicy': {
+            'maxAttempts': 3,
+            'initialBackoff': '0.05s',
+            'maxBackoff': '0.5s',
+            'backoffMultiplier': 2,
+            'retryableStatusCodes': ['UNAVAILABLE'],
+        },
+    }],
+    # Quand trop d'appels échouent, gRPC cesse de rejouer : pas de tempête de tentatives.
+    'retryThrottling': {'maxTokens': 10, 'tokenRatio': 0.1},
+})
+
+# Lectures unitaires hedgées (GetBook, GetMemberDetail) : sans réponse après ce
+# délai, une seconde tentative part en parallèle et la première réponse gagne.
+# gRPC Python ignore le hedgingPolicy du service config, d'où _hedged().
+# 0 désactive le hedging.
+HEDGE_DELAY = float(os.environ.get('LIBRARY_GRPC_HEDGE_MS', '100')) / 1000
+
+
+class _CallDetails(collections.namedtuple('_CallDetails', ('method', 'timeout', 'metadata', 'credentials',
+                                                           'wait_for_ready', 'compression')),
+                   grpc.ClientCallDetails):
+    pass
+
+
+def _short_method(method):
+    if isinstance(method, bytes):
+        method = method.decode()
+    return method.rsplit('/', 1)[-1]
+
+
+class ClientRpcStats:
+    """Compteurs du processus par RPC : hedges, délais dépassés, circuits ouverts et appels refusés."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+
+    def incr(self, name, method):
+        with self._lock:
+            self._counts[(name, method)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+RPC_STATS = ClientRpcStats()
+
+
+class DeadlineInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                          grpc.StreamUnaryClientInterceptor):
+    """Ajoute le délai de METHOD_DEADLINES aux appels sans timeout et compte les DEADLINE_EXCEEDED."""
+
+    def _with_deadline(self, client_call_details):
+        method = _short_method(client_call_details.method)
+        timeout = client_call_details.timeout
+        if timeout is None:
+            timeout = METHOD_DEADLINES.get(method, DEFAULT_DEADLINE)
+        details = _CallDetails(client_call_details.method, timeout, client_call_details.metadata,
+                               client_call_details.credentials, client_call_details.wait_for_ready,
+                               client_call_details.compression)
+        return method, details
+
+    @staticmethod
+    def _watch(method, call):
+        def done(call):
+            if call.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                RPC_STATS.incr('deadline_exceeded', method)
+        call.add_done_callback(done)
+        return call
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        method, details = self._with_deadline(client_call_details)
+        return self._watch(method, continuation(details, request))
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        method, details = self._with_deadline(client_call_details)
+        return self._watch(method, continuation(details, request))
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        method, details = self._with_deadline(client_call_details)
+        return self._watch(method, continuation(details, request_iterator))
+
+
+def _first_done(calls, timeout=None):
+    """Attend qu'un des appels (futures gRPC) soit terminé ; None si `timeout` expire avant."""
+    event = threading.Event()
+    for call in calls:
+        call.add_done_callback(lambda _: event.set())
+    event.wait(timeout)
+    return next((call for call in calls if call.done()), None)
+
+
+def _hedged(method, multicallable, request, delay=None):
+    """
+    Appel unitaire hedgé de `method`, pour les lectures seulement. La première
+    réponse réussie l'emporte et l'autre tentative est annulée ; si les deux
+    échouent, l'erreur de la dernière est levée.
+    """
+    delay = HEDGE_DELAY if delay is None else delay
+    first = multicallable.future(request)
+    if not delay or _first_done([first], delay) is not None:
+        return first.result()
+    RPC_STATS.incr('hedged', method)
+    pending = [first, multicallable.future(request)]
+    while True:
+        winner = _first_done(pending)
+        pending.remove(winner)
+        if winner.exception() is None or not pending:
+            break
+    for call in pending:
+        call.cancel()
+    if winner is not first:
+        RPC_STATS.incr('hedge_won', method)
+    return winner.result()
+
+
+def rpc_stats():
+    """Compteurs des appels de ce processus : {(compteur, rpc): nombre}."""
+    return RPC_STATS.snapshot()
+
+# ----------------------------------------------------
+# 5. CIRCUIT BREAKER
+# ----------------------------------------------------
+
+# Échecs consécutifs (UNAVAILABLE, DEADLINE_EXCEEDED) qui ouvrent le circuit
+# d'une RPC : ses appels échouent alors immédiatement, sans attendre délais ni
+# nouvelles tentatives. 0 désactive le disjoncteur.
+BREAKER_FAILURES = int(os.environ.get('LIBRARY_GRPC_BREAKER_FAILURES', '5'))
+BREAKER_THRESHOLDS = {
+    # Flux complets et imports : chaque échec a déjà coûté un long délai.
+    'SearchBooksBatched': 2, 'GetAllMembersBatched': 2, 'CreateBooks': 2,
+    # Mutations : gRPC les a déjà rejouées avant de signaler l'échec.
+    'BorrowBook': 3, 'ReturnBook': 3, 'CreateBook': 3,
+}
+# Durée (s) d'ouverture avant un appel d'essai, si le canal ne signale pas plus
+# tôt que la connexion au serveur est rétablie.
+BREAKER_RESET = float(os.environ.get('LIBRARY_GRPC_BREAKER_RESET', '5'))
+# Codes qui signalent un serveur absent ou saturé ; les autres sont des réponses.
+BREAKER_FAILURE_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+
+class CircuitOpenError(grpc.RpcError, grpc.Call, grpc.Future):
+    """
+    Appel refusé sans contacter le serveur. Se comporte comme un appel
+    terminé en UNAVAILABLE : les `except grpc.RpcError` existants s'appliquent.
+    """
+    def __init__(self, method):
+        super().__init__(f"Circuit ouvert pour {method} : serveur gRPC indisponible.")
+        self.method = method
+
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+    def details(self):
+        return self.args[0]
+
+    def initial_metadata(self):
+        return ()
+
+    def trailing_metadata(self):
+        return ()
+
+    def is_active(self):
+        return False
+
+    def time_remaining(self):
+        return None
+
+    def add_callback(self, callback):
+        return False
+
+    def cancel(self):
+        return False
+
+    def cancelled(self):
+        return False
+
+    def running(self):
+        return False
+
+    def done(self):
+        return True
+
+    def result(self, timeout=None):
+        raise self
+
+    def exception(self, timeout=None):
+        return self
+
+    def traceback(self, timeout=None):
+        return None
+
+    def add_done_callback(self, fn):
+        fn(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raise self
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'une RPC. Fermé : les appels passent et les échecs
+    consécutifs sont comptés. Ouvert : échec immédiat. Semi-ouvert (après
+    BREAKER_RESET, ou dès que le canal redevient READY) : un seul appel
+    d'essai passe ; il referme le circuit s'il obtient une réponse, le
+    rouvre sinon.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, method, threshold, reset_timeout=BREAKER_RESET):
+        self.method = method
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self):
+        """(autorisé, appel d'essai)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True, False
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False, False
+                self.state = self.HALF_OPEN
+            if self._probing:
+                return False, False
+            self._probing = True
+            return True, True
+
+    def record(self, code, probe):
+        with self._lock:
+            if probe:
+                self._probing = False
+                if code == grpc.StatusCode.CANCELLED:
+                    return   # essai abandonné par l'appelant : le suivant réessaiera
+                if code in BREAKER_FAILURE_CODES:
+                    self._open()
+                else:
+                    self.state, self._failures = self.CLOSED, 0
+            elif self.state == self.CLOSED:
+                # Les appels partis avant l'ouverture ne changent plus l'état.
+                if code in BREAKER_FAILURE_CODES:
+                    self._failures += 1
+                    if self._failures >= self.threshold:
+                        self._open()
+                elif code != grpc.StatusCode.CANCELLED:
+                    self._failures = 0
+
+    def _open(self):
+        if self.state != self.OPEN:
+            RPC_STATS.incr('circuit_opened', self.method)
+        self.state, self._opened_at, self._failures = self.OPEN, time.monotonic(), 0
+
+    def half_open(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                self.state = self.HALF_OPEN
+
+
+class CircuitBreakers:
+    """Disjoncteurs du processus, un par RPC, partagés par tous les canaux du pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, method):
+        breaker = self._breakers.get(method)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    method, CircuitBreaker(method, BREAKER_THRESHOLDS.get(method, BREAKER_FAILURES))
+                )
+        return breaker
+
+    def on_connectivity(self, state):
+        """Callback de channel.subscribe() : connexion rétablie, chaque circuit ouvert tente un essai."""
+        if state == grpc.ChannelConnectivity.READY:
+            for breaker in list(self._breakers.values()):
+                breaker.half_open()
+
+    def states(self):
+        return {method: breaker.state for method, breaker in list(self._breakers.items())}
+
+
+CIRCUIT_BREAKERS = CircuitBreakers()
+
+
+class CircuitBreakerInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                                grpc.StreamUnaryClientInterceptor):
+    """Premier intercepteur de la chaîne : un circuit ouvert n'atteint ni les délais ni gRPC."""
+
+    def _intercept(self, continuation, client_call_details, request):
+        method = _short_method(client_call_details.method)
+        breaker = CIRCUIT_BREAKERS.get(method)
+        allowed, probe = breaker.allow()
+        if not allowed:
+            RPC_STATS.incr('circuit_rejected', method)
+            return CircuitOpenError(method)
+        try:
+            call = continuation(client_call_details, request)
+        except Exception:
+            breaker.record(grpc.StatusCode.UNKNOWN, probe)
+            raise
+        call.add_done_callback(lambda call: breaker.record(call.code(), probe))
+        return call
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return self._intercept(continuation, client_call_details, request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return self._intercept(continuation, client_call_details, request)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return self._intercept(continuation, client_call_details, request_iterator)
+
+
+def circuit_states():
+    """État des disjoncteurs de ce processus : {rpc: 'closed' | 'open' | 'half_open'}."""
+    return CIRCUIT_BREAKERS.states()
+
+# ----------------------------------------------------
+# 6. SESSION TOKEN
+# ----------------------------------------------------
+
+# Jeton renvoyé par UserLogin, présenté par chaque appel de la requête HTTP en
+# cours (voir middleware.GrpcSessionTokenMiddleware, qui le lit dans la session).
+AUTH_METADATA_KEY = 'authorization'
+_session_token = contextvars.ContextVar('library_session_token', default=None)
+
+
+def set_session_token(token):
+    """Jeton des appels suivants du contexte courant ; retourne de quoi le restaurer."""
+    return _session_token.set(token or None)
+
+
+def reset_session_token(previous):
+    _session_token.reset(previous)
+
+
+class SessionTokenInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                              grpc.StreamUnaryClientInterceptor):
+    """Ajoute `authorization: Bearer <jeton>` aux appels quand un jeton de session est défini."""
+
+    def _with_token(self, client_call_details):
+        token = _session_token.get()
+        if token is None:
+            return client_call_details
+        metadata = list(client_call_details.metadata or ())
+        metadata.append((AUTH_METADATA_KEY, f'Bearer {token}'))
+        return _CallDetails(client_call_details.method, client_call_details.timeout, metadata,
+                            client_call_details.credentials, client_call_details.wait_for_ready,
+                            client_call_details.compression)
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return continuation(self._with_token(client_call_details), request)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return continuation(self._with_token(client_call_details), request)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return continuation(self._with_token(client_call_details), request_iterator)
+
+# ----------------------------------------------------
+# 7. SERVER QUERY STATS (DEBUG ONLY)
+# ----------------------------------------------------
+
+# Trailing metadata ajoutées par le serveur lancé avec LIBRARY_QUERY_STATS=1.
+QUERY_COUNT_KEY = 'x-query-count'
+QUERY_TIME_KEY = 'x-query-time-ms'
+
+_recent_calls = threading.local()
+
+
+def _query_stats_enabled():
+    try:
+        from django.conf import settings
+        return bool(settings.DEBUG)
+    except Exception:
+        return False
+
+
+class QueryStatsInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                            grpc.StreamUnaryClientInterceptor):
+    """Garde les appels du thread courant pour lire leurs trailing metadata au rendu."""
+
+    def _remember(self, client_call_details, call):
+        calls = getattr(_recent_calls, 'calls', None)
+        if calls is None:
+            calls = _recent_calls.calls = collections.deque(maxlen=100)
+        calls.append((_short_method(client_call_details.method), call))
+        return call
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return self._remember(client_call_details, continuation(client_call_details, request))
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return self._remember(client_call_details, continuation(client_call_details, request))
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return self._remember(client_call_details, continuation(client_call_details, request_iterator))
+
+
+def pop_query_stats():
+    """
+    Retourne [(rpc, nombre de requêtes SQL, durée en ms)] des appels terminés
+    du thread courant, puis oublie tous ses appels. Vide si le serveur ne
+    compte pas les requêtes.
+    """
+    calls = getattr(_recent_calls, 'calls', None)
+    if not calls:
+        return []
+    stats = []
+    for method, call in calls:
+        # Un flux encore ouvert (WatchAvailability) n'a pas de trailing metadata.
+        if not call.done():
+            continue
+        metadata = dict(call.trailing_metadata() or ())
+        if QUERY_COUNT_KEY in metadata:
+            stats.append((method, int(metadata[QUERY_COUNT_KEY]), float(metadata.get(QUERY_TIME_KEY, 0))))
+    calls.clear()
+    return stats
+
+# ----------------------------------------------------
+# 8. VERSIONED ENTITY CACHE
+# ----------------------------------------------------
+
+# Nombre de livres et membres gardés par processus worker.
+ENTITY_CACHE_SIZE = int(os.environ.get('LIBRARY_CLIENT_CACHE_SIZE', '1000'))
+
+
+class VersionedCache:
+    """
+    LRU des derniers Book / Member lus, avec leur version. Chaque lecture
+    reste un appel au serveur (if_version) : une entrée n'est jamais servie
+    sans avoir été confirmée, mais si elle est à jour le serveur ne renvoie
+    que quelques octets au lieu de tout le message. Les messages en cache
+    sont partagés : ne pas les modifier.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()   # (type, id) -> message
+
+    def get(self, key):
+        with self._lock:
+            message = self._entries.get(key)
+            if message is not None:
+                self._entries.move_to_end(key)
+            return message
+
+    def put(self, key, message):
+        with self._lock:
+            self._entries[key] = message
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+ENTITY_CACHE = VersionedCache(ENTITY_CACHE_SIZE)
+
+
+def _conditional_get(key, method, multicallable, request, extra=()):
+    """
+    Lecture conditionnelle et hedgée : envoie la version en cache (if_version)
+    et réutilise le message en cache si le serveur répond not_modified.
+    `extra` : autres champs du message en cache envoyés en if_<champ>, pour ce
+    qui change sans la version (le stock d'un livre).
+    """
+    cached = ENTITY_CACHE.get(key)
+    if cached is not None:
+        request.if_version = cached.version
+        for field in extra:
+            setattr(request, f'if_{field}', getattr(cached, field))
+    try:
+        message = _hedged(method, multicallable, request)
+    except grpc.RpcError:
+        ENTITY_CACHE.discard(key)
+        raise
+    if message.not_modified and cached is not None:
+        return cached
+    ENTITY_CACHE.put(key, message)
+    return message
+
+
 class LibraryClient:
     """
     Client-side wrapper to manage remote calls (RPCs) to the gRPC Server.
+    Instances are cheap: they borrow a channel from the shared pool.
     """
     def __init__(self):
-        self.channel = grpc.insecure_channel(SERVER_ADDRESS) 
-        self.stub = library_pb2_grpc.LibraryServiceStub(self.channel)
+        self.channel, self.stub = get_channel_pool().get()
 
     # ----------------------------------------------------
     # A. Authentication (Librarian Login)
@@ -40,6 +696,9 @@ class LibraryClient:
             return response
         except grpc.RpcError as e:
             print(f"Error calling UserLogin RPC: {e.details()}")
+            if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+                # Serveur saturé de connexions : son message invite à réessayer.
+                return library_pb2.LoginResponse(success=False, message=e.details())
             return library_pb2.LoginResponse(
                 success=False, 
                 message=f"Connection error to gRPC server: {e.details()}"
@@ -49,9 +708,13 @@ class LibraryClient:
     # B. Inventory Lookup (Search)
     # ----------------------------------------------------
     
-    def search_books(self, query):
-        """Calls the remote SearchBooks RPC to retrieve a stream of books."""
-        request = library_pb2.SearchRequest(query=query)
+    def search_books(self, query, fields=None):
+        """
+        Calls the remote SearchBooks RPC to retrieve a stream of books.
+        `fields` restreint les champs lus et envoyés (read_mask) ; id et
+        title sont toujours présents.
+        """
+        request = library_pb2.SearchRequest(query=query, read_mask=_field_mask(fields))
         
         try:
             return list(self.stub.SearchBooks(request))
@@ -59,18 +722,51 @@ class LibraryClient:
             print(f"Error calling SearchBooks RPC: {e.details()}")
             return []
 
+    def search_books_page(self, query, page_size=PAGE_SIZE, page_token="", fields=None):
+        """
+        Récupère une seule page de SearchBooks.
+        Retourne (livres, curseur_suivant) ; le curseur est vide sur la dernière page.
+        """
+        request = library_pb2.SearchRequest(query=query, page_size=page_size, page_token=page_token,
+                                            read_mask=_field_mask(fields))
+        try:
+            call = self.stub.SearchBooks(request)
+            books = list(call)
+            return books, _next_page_token(call)
+        except grpc.RpcError as e:
+            print(f"Error calling SearchBooks RPC: {e.details()}")
+            return [], ""
+
+    def iter_books(self, query="", batch_size=500, fields=None):
+        """
+        Parcourt tout le résultat de SearchBooksBatched livre par livre, au fil
+        de la réception : un message par lot de `batch_size` livres au lieu
+        d'un message par livre. À préférer à search_books() pour les exports.
+        """
+        request = library_pb2.SearchRequest(query=query, batch_size=batch_size, read_mask=_field_mask(fields))
+        try:
+            for batch in self.stub.SearchBooksBatched(request):
+                yield from batch.books
+        except grpc.RpcError as e:
+            print(f"Error calling SearchBooksBatched RPC: {e.details()}")
+
     # ----------------------------------------------------
     # C. Inventory Management (Create Book)
     # ----------------------------------------------------
-    def create_book(self, title, author, isbn, total_copies, image_path=None):
-        """Calls the remote CreateBook RPC on the server to add a new book."""
+    def create_book(self, title, author, isbn, total_copies, image_path=None, request_id=None):
+        """
+        Calls the remote CreateBook RPC on the server to add a new book.
+        `request_id` : clé d'idempotence (générée si absente) ; la réutiliser
+        pour un nouvel essai renvoie la réponse d'origine sans créer de doublon.
+        """
         
         book_request = library_pb2.Book(
             title=title,
             author=author,
             isbn=isbn,
             total_copies=total_copies, 
-            image_url=image_path if image_path else "" 
+            image_url=image_path if image_path else "",
+            request_id=request_id or new_request_id()
         )
         
         try:
@@ -87,6 +783,34 @@ class LibraryClient:
                 message=f"RPC Failed ({status_code.name}): {details}"
             )
 
+    def create_books(self, books):
+        """
+        Import en masse via le flux CreateBooks.
+        `books` est un itérable (consommé au fil de l'envoi) de library_pb2.Book
+        ou de dicts avec les clés title, author, isbn, total_copies, image_path.
+        Retourne un BulkCreateResponse avec les erreurs ligne par ligne.
+        """
+        def messages():
+            for book in books:
+                if isinstance(book, library_pb2.Book):
+                    yield book
+                else:
+                    yield library_pb2.Book(
+                        title=book.get('title', ''),
+                        author=book.get('author', ''),
+                        isbn=book.get('isbn', ''),
+                        total_copies=int(book.get('total_copies') or 1),
+                        image_url=book.get('image_path') or "",
+                    )
+
+        try:
+            return self.stub.CreateBooks(messages())
+        except grpc.RpcError as e:
+            print(f"Error calling CreateBooks RPC: {e.details()}")
+            response = library_pb2.BulkCreateResponse()
+            response.errors.add(index=-1, message=f"RPC Failed ({e.code().name}): {e.details()}")
+            return response
+
     # ----------------------------------------------------
     # D. Staff Profile (Update & Creation)
     # ----------------------------------------------------
@@ -121,16 +845,57 @@ class LibraryClient:
             )
     def delete_member(self, m_id):
         return self.stub.DeleteMember(library_pb2.UserIdRequest(user_id=str(m_id)))
-    def update_member(self, m_id, name, email, phone):
-        req = library_pb2.Member(id=str(m_id), full_name=name, email=email, phone=phone)
-        return self.stub.UpdateMember(req)
+    def update_member(self, m_id, name, email, phone, fields=None, version=0):
+        """
+        `fields` : champs à écrire (update_mask) ; None les réécrit tous.
+        `version` : version lue avec la fiche ; le serveur refuse (ABORTED)
+        si le membre a été modifié depuis. 0 désactive le contrôle.
+        """
+        req = library_pb2.Member(id=str(m_id), full_name=name, email=email, phone=phone,
+                                 update_mask=_field_mask(fields), version=version)
+        try:
+            return self.stub.UpdateMember(req)
+        except grpc.RpcError as e:
+            print(f"Error calling UpdateMember: {e.details()}")
+            return library_pb2.StatusResponse(success=False, message=e.details())
     def get_member_detail(self, m_id):
-        return self.stub.GetMemberDetail(library_pb2.UserIdRequest(user_id=str(m_id)))
+        """GetMemberDetail conditionnel (voir VersionedCache) ; None si le membre est introuvable."""
+        request = library_pb2.UserIdRequest(user_id=str(m_id))
+        try:
+            return _conditional_get(('member', str(m_id)), 'GetMemberDetail', self.stub.GetMemberDetail, request)
+        except grpc.RpcError as e:
+            print(f"Error calling GetMemberDetail RPC: {e.details()}")
+            return None
     def create_member(self, full_name, email, phone):
         req = library_pb2.Member(full_name=full_name, email=email, phone=phone)
         return self.stub.CreateMember(req)        
     def get_all_members(self):
         return list(self.stub.GetAllMembers(library_pb2.SearchRequest(query="")))
+
+    def iter_members(self, batch_size=500):
+        """Comme iter_books(), pour GetAllMembersBatched."""
+        request = library_pb2.SearchRequest(batch_size=batch_size)
+        try:
+            for batch in self.stub.GetAllMembersBatched(request):
+                yield from batch.members
+        except grpc.RpcError as e:
+            print(f"Error calling GetAllMembersBatched RPC: {e.details()}")
+
+    def get_members_page(self, page_size=PAGE_SIZE, page_token="", query="", borrowing_book_id=None):
+        """
+        Récupère une page de membres (du plus récent au plus ancien) et le curseur suivant.
+        `query` filtre sur le nom ou l'e-mail ; `borrowing_book_id` ne garde que
+        les membres qui ont ce livre en prêt.
+        """
+        request = library_pb2.SearchRequest(query=query, page_size=page_size, page_token=page_token,
+                                            borrowing_book_id=int(borrowing_book_id or 0))
+        try:
+            call = self.stub.GetAllMembers(request)
+            members = list(call)
+            return members, _next_page_token(call)
+        except grpc.RpcError as e:
+            print(f"Error calling GetAllMembers RPC: {e.details()}")
+            return [], ""
     #D2. Creation Wrapper (Uses update_staff_profile for detournement)
     def create_user(self, username, email, password):
         """Crée un nouvel utilisateur staff en détournant le RPC UpdateStaffProfile."""
@@ -150,8 +915,17 @@ class LibraryClient:
     # F. Book Management (Update & Delete) 🚀 NOUVEAU 🚀
     # ----------------------------------------------------
 
-    def update_book(self, book_obj):
-        """Appelle le RPC UpdateBookAvailability pour mettre à jour les infos d'un livre."""
+    def update_book(self, book_obj, fields=None):
+        """
+        Appelle le RPC UpdateBookAvailability pour mettre à jour les infos d'un livre.
+        `fields` limite l'UPDATE aux champs modifiés (update_mask) ; None les réécrit tous.
+        Si book_obj.version est renseigné, un livre modifié depuis sa lecture
+        est refusé (ABORTED) : le message d'échec invite à recharger la fiche.
+        Idem pour available_copies si book_obj.expected_available_copies (stock
+        lu avec la fiche) est renseigné : un emprunt ou un retour concurrent
+        n'est pas écrasé.
+        """
+        book_obj.update_mask.CopyFrom(_field_mask(fields))
         try:
             return self.stub.UpdateBookAvailability(book_obj)
         except grpc.RpcError as e:
@@ -169,29 +943,72 @@ class LibraryClient:
             print(f"Error calling DeleteBook RPC: {e.details()}")
             return library_pb2.StatusResponse(success=False, message=e.details())
 
+    def get_books(self, ids):
+        """
+        Récupère plusieurs livres par identifiant (GetBooks, par lots de IDS_PER_CALL).
+        Retourne (livres dans l'ordre demandé, ids introuvables).
+        """
+        return self._get_many(self.stub.GetBooks, 'books', ids)
+
+    def get_members(self, ids):
+        """Comme get_books(), pour GetMembers."""
+        return self._get_many(self.stub.GetMembers, 'members', ids)
+
+    def _get_many(self, rpc, field, ids):
+        found, missing, valid = [], [], []
+        for raw in ids:
+            try:
+                valid.append(int(raw))
+            except (TypeError, ValueError):
+                missing.append(raw)
+        valid = list(dict.fromkeys(valid))
+        for start in range(0, len(valid), IDS_PER_CALL):
+            chunk = valid[start:start + IDS_PER_CALL]
+            try:
+                response = rpc(library_pb2.IdListRequest(ids=chunk))
+            except grpc.RpcError as e:
+                print(f"Error calling {field} multi-get RPC: {e.details()}")
+                # Non lus : signalés comme introuvables plutôt que perdus silencieusement.
+                missing.extend(valid[start:])
+                break
+            found.extend(getattr(response, field))
+            missing.extend(response.missing_ids)
+        return found, missing
+
     def get_book_detail(self, book_id):
-        """Appelle le RPC GetBook pour récupérer les données d'un livre spécifique."""
+        """
+        Appelle le RPC GetBook pour récupérer les données d'un livre spécifique.
+        Lecture conditionnelle : un livre inchangé depuis la dernière lecture
+        n'est pas renvoyé par le serveur (voir VersionedCache).
+        """
         request = library_pb2.SearchRequest(query=str(book_id))
         try:
-            return self.stub.GetBook(request)
+            return _conditional_get(('book', str(book_id)), 'GetBook', self.stub.GetBook, request,
+                                    extra=('available_copies',))
         except grpc.RpcError as e:
             print(f"Error calling GetBook RPC: {e.details()}")
             return None
-    def return_book(self, member_id, book_id):
-        """Appelle le serveur pour enregistrer un retour."""
+    def return_book(self, member_id, book_id, request_id=None):
+        """Appelle le serveur pour enregistrer un retour (idempotent, comme borrow_book)."""
         request = library_pb2.BorrowRequest(
             member_id=str(member_id),
-            book_id=int(book_id)
+            book_id=int(book_id),
+            request_id=request_id or new_request_id()
         )
         try:
             return self.stub.ReturnBook(request)
         except grpc.RpcError as e:
             return library_pb2.StatusResponse(success=False, message="Erreur de connexion au serveur.")
-    def borrow_book(self, member_id, book_id):
-        """Appelle le serveur pour enregistrer un emprunt."""
+    def borrow_book(self, member_id, book_id, request_id=None):
+        """
+        Appelle le serveur pour enregistrer un emprunt. `request_id` identifie
+        l'opération (généré si absent) : les nouveaux essais de gRPC et un
+        formulaire soumis deux fois ne créent qu'un seul prêt.
+        """
         request = library_pb2.BorrowRequest(
             member_id=str(member_id),
-            book_id=int(book_id)
+            book_id=int(book_id),
+            request_id=request_id or new_request_id()
         )
         try:
             return self.stub.BorrowBook(request)
@@ -207,6 +1024,24 @@ class LibraryClient:
             print(f"Error calling GetAllUsers RPC: {e.details()}")
             return []
 
+    def get_library_stats(self):
+        """Appelle le RPC GetLibraryStats : totaux du tableau de bord calculés par la base."""
+        try:
+            return self.stub.GetLibraryStats(library_pb2.StatsRequest())
+        except grpc.RpcError as e:
+            print(f"Error calling GetLibraryStats RPC: {e.details()}")
+            return library_pb2.LibraryStats()
+
+    def watch_availability(self, book_ids=()):
+        """
+        Ouvre le flux WatchAvailability (tous les livres si `book_ids` est vide).
+        Retourne l'appel gRPC : on l'itère pour recevoir les AvailabilityUpdate
+        et on appelle .cancel() pour se désabonner. Une mise à jour avec
+        resync=True signifie que des notifications ont été perdues : relire l'état.
+        """
+        request = library_pb2.WatchRequest(book_ids=[int(b) for b in book_ids])
+        return self.stub.WatchAvailability(request)
+
     def get_user_details(self, user_id):
         """Appelle le RPC GetUserDetail pour récupérer un seul utilisateur (pour l'édition)."""
         request = library_pb2.UserIdRequest(user_id=str(user_id))
@@ -0,0 +1,32 @@
+import time
+
+from .grpc_client import reset_session_token, set_session_token
+
+# Marge (s) avant l'expiration du jeton : au-delà, on redemande la connexion
+# plutôt que de laisser les appels échouer en cours de page.
+TOKEN_EXPIRY_MARGIN = 60
+
+
+class GrpcSessionTokenMiddleware:
+    """
+    Présente le jeton de session gRPC de l'utilisateur connecté (obtenu par
+    UserLogin) à tous les appels de LibraryClient faits pendant la requête.
+    Une session sans jeton valide (expiré, ou ouverte avant les jetons)
+    déconnecte l'utilisateur.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.session.get('grpc_token')
+        expires = request.session.get('grpc_token_expires', 0)
+        if request.session.get('staff_id') and (not token or expires - TOKEN_EXPIRY_MARGIN <= time.time()):
+            for key in ('staff_id', 'grpc_token', 'grpc_token_expires'):
+                request.session.pop(key, None)
+            request.session['login_message'] = "Session expirée, veuillez vous reconnecter."
+            token = None
+        previous = set_session_token(token)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_session_token(previous)
@@ -5,9 +5,22 @@ from django.http import HttpRequest
 from django.urls import reverse
 from django.contrib import messages
 from django.core.files.storage import FileSystemStorage 
-from .grpc_client import LibraryClient 
+from .grpc_client import LibraryClient, new_request_id 
 from django.utils import timezone
 from datetime import timedelta
+
+# Projections (read_mask) des écrans qui n'affichent qu'une partie du livre.
+DASHBOARD_BOOK_FIELDS = ('author', 'total_copies', 'available_copies', 'image_url')
+CHOICE_BOOK_FIELDS = ('available_copies',)
+# Champs des formulaires d'édition ; chacun a un champ caché original_<nom>.
+BOOK_FORM_FIELDS = ('title', 'author', 'isbn', 'total_copies', 'available_copies')
+MEMBER_FORM_FIELDS = ('full_name', 'email', 'phone')
+
+
+def _changed_fields(post, fields):
+    """Champs dont la valeur soumise diffère de celle affichée (champ caché original_<nom>)."""
+    return [name for name in fields if post.get(name, '') != post.get(f'original_{name}', '')]
+
 # NOTE: LibraryClient est importé ici et non dans les fonctions individuelles
 
 # ----------------------------------------------------
@@ -35,6 +48,9 @@ def staff_login(request: HttpRequest):
         if auth_response.success:
             request.session['staff_id'] = auth_response.user_id
             request.session['username'] = username
+            # Présenté par les appels gRPC suivants (middleware.GrpcSessionTokenMiddleware).
+            request.session['grpc_token'] = auth_response.session_token
+            request.session['grpc_token_expires'] = auth_response.expires_at
             return redirect('dashboard')
         else:
             message = auth_response.message
@@ -67,22 +83,26 @@ def dashboard(request: HttpRequest):
     query = request.GET.get('q', '')
     client = LibraryClient()
     
-    # 1. On récupère TOUS les livres pour les stats réelles (indépendant de la recherche)
-    all_books = list(client.search_books("")) 
+    # 1. Les statistiques sont agrégées côté serveur (un seul appel unaire)
+    stats = client.get_library_stats()
     
-    # 2. On récupère les résultats de la recherche pour l'affichage
-    book_results = list(client.search_books(query)) if query else all_books
-
-    total_available = sum(b.available_copies for b in all_books)
-    # Calcul basé sur la réalité physique des livres existants
-    total_borrowed = sum(b.total_copies - b.available_copies for b in all_books)
+    # 2. Résultats par pages de PAGE_SIZE livres, comme books_list
+    page_token = request.GET.get('page', '')
+    book_results, next_page_token = client.search_books_page(query, page_token=page_token,
+                                                             fields=DASHBOARD_BOOK_FIELDS)
 
     context = {
         'username': request.session.get('username'),
         'query': query,
         'book_results': book_results,
-        'total_available': total_available,
-        'total_borrowed': total_borrowed,
+        'page_token': page_token,
+        'next_page_token': next_page_token,
+        'total_available': stats.available_copies,
+        'total_borrowed': stats.borrowed_copies,
+        'total_titles': stats.total_titles,
+        'active_loans': stats.active_loans,
+        'overdue_loans': stats.overdue_loans,
+        'total_members': stats.total_members,
         'title': "Librarian Dashboard & Search",
     }
     return render(request, 'client_app/dashboard.html', context)
@@ -146,10 +166,22 @@ def edit_book_view(request, book_id):
             isbn=request.POST.get('isbn'),
             total_copies=int(request.POST.get('total_copies')),
             available_copies=int(request.POST.get('available_copies')),
-            image_url=new_image_path  # Ajout de l'image
+            image_url=new_image_path,  # Ajout de l'image
+            version=int(request.POST.get('version') or 0)
         )
-        
-        response = client.stub.UpdateBookAvailability(updated_book)
+        if request.POST.get('original_available_copies'):
+            # Stock affiché : refusé s'il a changé (emprunt, retour) avant l'envoi du formulaire.
+            updated_book.expected_available_copies = int(request.POST['original_available_copies'])
+
+        # Seuls les champs modifiés sont envoyés : un stock inchangé n'écrase
+        # pas les emprunts enregistrés depuis l'affichage du formulaire.
+        fields = _changed_fields(request.POST, BOOK_FORM_FIELDS)
+        if image_file:
+            fields.append('image_url')
+        if not fields:
+            messages.info(request, "Aucune modification.")
+            return redirect('books_list')
+        response = client.update_book(updated_book, fields)
         
         if response.success:
             messages.success(request, f"L'ouvrage '{updated_book.title}' a été mis à jour.")
@@ -158,9 +190,8 @@ def edit_book_view(request, book_id):
             messages.error(request, f"Échec de la mise à jour : {response.message}")
 
     # Récupération des données pour l'affichage
-    try:
-        book_to_edit = client.stub.GetBook(library_pb2.SearchRequest(query=str(book_id)))
-    except Exception:
+    book_to_edit = client.get_book_detail(book_id)
+    if book_to_edit is None:
         messages.error(request, "Erreur lors de la récupération du livre.")
         return redirect('books_list')
 
@@ -188,8 +219,13 @@ def delete_book(request, book_id):
     return redirect('books_list')
 def books_list(request):
     client = LibraryClient()
-    books = list(client.search_books(query=""))
-    return render(request, 'client_app/books_list.html', {'books': books})
+    page_token = request.GET.get('page', '')
+    books, next_page_token = client.search_books_page(query="", page_token=page_token)
+    return render(request, 'client_app/books_list.html', {
+        'books': books,
+        'page_token': page_token,
+        'next_page_token': next_page_token,
+    })
 
 def return_book_view(request):
     client = LibraryClient()
@@ -201,20 +237,32 @@ def return_book_view(request):
         book_id = request.POST.get('book_id')
         
         # Appel gRPC pour traiter le retour
-        response = client.return_book(member_id, book_id)
+        response = client.return_book(member_id, book_id, request.POST.get('request_id'))
         if response.success:
             messages.success(request, response.message)
             return redirect('dashboard')
         else:
             messages.error(request, response.message)
 
-    members = list(client.get_all_members())
-    books = list(client.search_books(query=""))
+    member_id = request.GET.get('member_id')
+    book_query = request.GET.get('book_q', '')
+    member_query = request.GET.get('member_q', '')
+    books, more_books = _book_choices(client, book_id, book_query)
+    target_book = next((b for b in books if str(b.id) == str(book_id)), None)
+    # Retour d'un livre connu : seuls ses emprunteurs sont proposés.
+    members, more_members = _member_choices(client, member_id, member_query,
+                                            borrowing_book_id=target_book.id if target_book else None)
     
     return render(request, 'client_app/issue_book.html', {
         'members': members,
         'books': books,
+        'more_members': more_members,
+        'more_books': more_books,
+        'member_query': member_query,
+        'book_query': book_query,
         'preselected_book_id': book_id,
+        'preselected_member_id': member_id,
+        'request_id': new_request_id(),
         'title': "Return a Book" # Optionnel : pour changer le titre
     })
 # def add_book(request: HttpRequest):
@@ -301,7 +349,8 @@ def add_book(request: HttpRequest):
         client = LibraryClient()
         response = client.create_book(
             title=title, author=author, isbn=isbn,
-            total_copies=total_copies, image_path=image_path_string
+            total_copies=total_copies, image_path=image_path_string,
+            request_id=request.POST.get('request_id')
         )
 
         if response.success:
@@ -311,32 +360,67 @@ def add_book(request: HttpRequest):
         else:
             messages.error(request, f"Error: {response.message}")
 
-    return render(request, 'client_app/add_book.html', {'title': "Add New Book"})
+    # Clé d'idempotence du formulaire : une double soumission ne crée qu'un livre.
+    return render(request, 'client_app/add_book.html', {'title': "Add New Book", 'request_id': new_request_id()})
 
 # --- Section Membres dans client_app/views.py ---
+def _book_choices(client, book_id, query=""):
+    """
+    Livres proposés dans le formulaire d'emprunt/retour : seulement le livre
+    présélectionné (un GetBook conditionnel) quand on arrive depuis une fiche, sinon la
+    première page (PAGE_SIZE) de la recherche `query`, jamais tout le catalogue.
+    Retourne (livres, plus) : `plus` indique qu'il faut affiner la recherche.
+    """
+    if book_id:
+        book = client.get_book_detail(book_id)
+        if book is not None:
+            return [book], False
+    books, next_page_token = client.search_books_page(query, fields=CHOICE_BOOK_FIELDS)
+    return books, bool(next_page_token)
+
+
+def _member_choices(client, member_id, query="", borrowing_book_id=None):
+    """
+    Comme _book_choices(), pour les membres (recherche sur le nom ou l'e-mail).
+    Avec `borrowing_book_id`, seuls les membres qui ont ce livre en prêt.
+    """
+    if member_id:
+        members, _ = client.get_members([member_id])
+        if members:
+            return members, False
+    members, next_page_token = client.get_members_page(query=query, borrowing_book_id=borrowing_book_id)
+    return members, bool(next_page_token)
+
+
 def issue_book_view(request):
     client = LibraryClient()
     book_id = request.GET.get('book_id')
     member_id = request.GET.get('member_id') 
     
-    members = list(client.get_all_members())
-    books = list(client.search_books(query=""))
+    book_query = request.GET.get('book_q', '')
+    member_query = request.GET.get('member_q', '')
+    books, more_books = _book_choices(client, book_id, book_query)
     
     target_book = next((b for b in books if str(b.id) == str(book_id)), None)
     
     # Mode retour si forcé par l'URL ou si le livre est épuisé
     is_return_mode = (request.GET.get('mode') == 'return' or 
                      (target_book and target_book.available_copies == 0))
+    # En retour d'un livre connu, seuls ses emprunteurs sont proposés.
+    members, more_members = _member_choices(client, member_id, member_query,
+                                            borrowing_book_id=target_book.id if is_return_mode and target_book else None)
     
     if request.method == "POST":
         action = request.POST.get('action')
         m_id = request.POST.get('member_id')
         b_id = request.POST.get('book_id')
 
+        # Même clé d'idempotence pour une soumission répétée du même formulaire.
+        request_id = request.POST.get('request_id')
         if action == "borrow":
-            response = client.borrow_book(m_id, int(b_id))
+            response = client.borrow_book(m_id, int(b_id), request_id)
         elif action == "return":
-            response = client.return_book(m_id, int(b_id))
+            response = client.return_book(m_id, int(b_id), request_id)
         
         if response.success:
             messages.success(request, response.message)
@@ -348,7 +432,12 @@ def issue_book_view(request):
         'books': books,
         'preselected_book_id': book_id,
         'preselected_member_id': member_id, # 👈 On l'envoie au template
+        'more_members': more_members,
+        'more_books': more_books,
+        'member_query': member_query,
+        'book_query': book_query,
         'is_return_mode': is_return_mode,
+        'request_id': new_request_id(),
         'default_due_date': (timezone.now() + timedelta(days=14)).strftime('%Y-%m-%d')
     })
 def members_list(request):
@@ -358,10 +447,13 @@ def members_list(request):
         
     client = LibraryClient()
     
-    members_grpc = list(client.get_all_members()) 
+    page_token = request.GET.get('page', '')
+    members_grpc, next_page_token = client.get_members_page(page_token=page_token)
     
     context = {
         'members': members_grpc,
+        'page_token': page_token,
+        'next_page_token': next_page_token,
         'title': "Gestion des Membres",
         'username': request.session.get('username'), # Pour le panel de profil
         'logo_image': "book_covers/ismac_logo.png",
@@ -401,16 +493,26 @@ def edit_member(request, member_id):
     client = LibraryClient()
     
     if request.method == 'POST':
-        client.update_member(
+        fields = _changed_fields(request.POST, MEMBER_FORM_FIELDS)
+        if not fields:
+            return redirect('members_list')
+        response = client.update_member(
             m_id=str(member_id), # gRPC attend souvent des strings pour les IDs
             name=request.POST.get('full_name'),
             email=request.POST.get('email'),
-            phone=request.POST.get('phone')
+            phone=request.POST.get('phone'),
+            fields=fields,
+            version=int(request.POST.get('version') or 0)
         )
-        return redirect('members_list')
+        if response.success:
+            return redirect('members_list')
+        # Conflit de version ou erreur : on réaffiche la fiche à jour.
+        messages.error(request, f"Échec de la mise à jour : {response.message}")
     
     # Si GET : on récupère les détails pour remplir le formulaire
     member = client.get_member_detail(str(member_id))
+    if member is None:
+        return redirect('members_list')
     return render(request, 'client_app/edit_member.html', {'member': member, 'title': "Modifier Membre"})
 
 def delete_member_action(request, member_id):
@@ -432,7 +534,12 @@ def delete_member_action(request, member_id):
 def create_user(request: HttpRequest):
     """
     Handles the creation of a new Staff/Librarian account.
+    Réservé au personnel connecté : le serveur exige un jeton de session.
     """
+    if not request.session.get('staff_id'):
+        request.session['login_message'] = "Authentification nécessaire pour créer un utilisateur."
+        return redirect('staff_login')
+
     # ✅ same media images used in login
     bg_image = "book_covers/Background.jpg"
     logo_image = "book_covers/ismac_logo.png"
@@ -480,8 +587,8 @@ def create_user(request: HttpRequest):
             context['username'] = ''
             context['email'] = ''
             
-            request.session['login_message'] = response.message + " Veuillez vous connecter."
-            return redirect('staff_login')
+            request.session['list_message'] = response.message
+            return redirect('users_list')
         else:
             pass
             
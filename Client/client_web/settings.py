@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'client_app.middleware.GrpcSessionTokenMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -58,6 +59,7 @@ TEMPLATES = [
                 # Custom context processor for media URL visibility in all templates
                  
                 'client_app.context_processors.global_images', # 👈 AJOUTEZ ÇA
+                'client_app.context_processors.rpc_query_stats',
             ],
         },
     },
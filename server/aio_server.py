@@ -0,0 +1,239 @@
+"""
+asyncio entry point for the library gRPC server.
+
+    python aio_server.py
+
+Runs the same LibraryServicer logic as grpc_handler.serve(), but on a
+grpc.aio server: RPCs are coroutines, so the number of calls in flight is
+no longer capped by a thread pool. Blocking ORM work is pushed to a
+bounded executor (LIBRARY_ORM_WORKERS threads). Streaming RPCs only
+borrow a thread to produce the next chunk of messages, or to insert the
+next batch of an upload, never for the whole lifetime of the stream, so
+slow SearchBooks readers or CreateBooks uploaders cannot starve
+BorrowBook.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import os
+import signal
+from concurrent import futures
+
+import grpc
+
+# grpc_handler configure Django avant tout accès à l'ORM.
+from grpc_handler import (
+    AVAILABILITY_HUB, BULK_CREATE_BATCH, IDEMPOTENCY_PURGE_SECONDS, METRICS_PORT, QUERY_STATS, SEARCH_INDEX,
+    SEARCH_INDEX_REFRESH_SECONDS, SERVER_OPTIONS, SHUTDOWN_GRACE, LibraryServicer, _search_index_rows,
+    _sort_row_errors, enable_metrics, start_idempotency_purger, start_search_index_refresher,
+)
+import library_pb2
+import library_pb2_grpc
+from auth import AsyncAuthInterceptor, start_hash_pool, stop_hash_pool
+from deadlines import call_with_deadline, enable_statement_deadlines, stream_with_deadline
+from metrics import AsyncMetricsInterceptor
+from query_stats import AsyncQueryStatsInterceptor, enable_query_stats
+
+ORM_WORKERS = int(os.environ.get('LIBRARY_ORM_WORKERS', '16'))
+# Nombre de messages produits par passage dans l'executor pour un flux.
+STREAM_CHUNK = 100
+
+
+class _Abort(Exception):
+    def __init__(self, code, details):
+        super().__init__(details)
+        self.code = code
+        self.details = details
+
+
+class _ThreadContext:
+    """
+    Synchronous ServicerContext facade for servicer code running in the
+    executor. `abort()` cannot be awaited from a worker thread, so it is
+    raised back to the event loop, which performs the real abort.
+    """
+    def __init__(self, context):
+        self._context = context
+
+    def abort(self, code, details=''):
+        raise _Abort(code, details)
+
+    def is_active(self):
+        return not self._context.done()
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+def _take(iterator, count):
+    return list(itertools.islice(iterator, count))
+
+
+class AsyncLibraryServicer(library_pb2_grpc.LibraryServiceServicer):
+    """
+    Async adapter around LibraryServicer. One coroutine is generated per
+    unary or server-streaming RPC of the service descriptor (see
+    _install_handlers below), so new RPCs added to LibraryServicer are
+    served here without extra code. Client-streaming RPCs need a native
+    version that reads the request stream on the event loop (CreateBooks).
+    """
+
+    def __init__(self, executor, servicer=None):
+        self._executor = executor
+        self._servicer = servicer or LibraryServicer()
+
+    # run_in_executor ne propage pas les ContextVar : on exécute dans une copie
+    # du contexte de l'appel (utilisée par query_stats pour attribuer les requêtes).
+    # Les appels passent par deadlines : un appel mort avant d'obtenir un thread
+    # (client parti, délai expiré) n'est pas exécuté.
+    async def _call(self, name, request, context):
+        return await self._run(getattr(self._servicer, name), request, context)
+
+    async def _run(self, method, request, context):
+        loop = asyncio.get_running_loop()
+        run = contextvars.copy_context().run
+        try:
+            return await loop.run_in_executor(self._executor, run, call_with_deadline, method, request,
+                                              _ThreadContext(context))
+        except _Abort as e:
+            await context.abort(e.code, e.details)
+
+    async def _stream(self, name, request, context):
+        loop = asyncio.get_running_loop()
+        method = getattr(self._servicer, name)
+        messages = stream_with_deadline(method, request, _ThreadContext(context))
+        run = contextvars.copy_context().run
+        exhausted = False
+        try:
+            while not context.done():
+                chunk = await loop.run_in_executor(self._executor, run, _take, messages, STREAM_CHUNK)
+                for message in chunk:
+                    yield message
+                if len(chunk) < STREAM_CHUNK:
+                    exhausted = True
+                    return
+        except _Abort as e:
+            exhausted = True
+            await context.abort(e.code, e.details)
+        finally:
+            if not exhausted:
+                # Client parti : on ferme le générateur pour libérer ses ressources.
+                await loop.run_in_executor(self._executor, run, messages.close)
+
+    # Version native : le flux est lu sur la boucle d'événements et seul chaque
+    # lot complet de BULK_CREATE_BATCH livres passe dans l'executor ; un client
+    # lent à envoyer son import n'y occupe aucun thread.
+    async def CreateBooks(self, request_iterator, context):
+        response = library_pb2.BulkCreateResponse()
+
+        def insert(batch, thread_context):
+            self._servicer._create_book_batch(batch, response)
+
+        batch = []
+        index = 0
+        async for request in request_iterator:
+            batch.append((index, request))
+            index += 1
+            if len(batch) >= BULK_CREATE_BATCH:
+                await self._run(insert, batch, context)
+                batch = []
+        if batch:
+            await self._run(insert, batch, context)
+        _sort_row_errors(response)
+        return response
+
+    # Version native : un abonné attend sur la boucle d'événements et
+    # n'occupe aucun thread de l'executor, d'où des milliers d'abonnés possibles.
+    async def WatchAvailability(self, request, context):
+        subscription = AVAILABILITY_HUB.subscribe(request.book_ids, loop=asyncio.get_running_loop())
+        try:
+            while not context.done() and not subscription.closed:
+                resync, updates = await subscription.wait_async()
+                if resync:
+                    yield library_pb2.AvailabilityUpdate(resync=True)
+                for book_id, available, delta in updates:
+                    yield library_pb2.AvailabilityUpdate(
+                        book_id=book_id, available_copies=available, delta=delta
+                    )
+        finally:
+            AVAILABILITY_HUB.unsubscribe(subscription)
+
+
+def _unary_handler(name):
+    async def handler(self, request, context):
+        return await self._call(name, request, context)
+    handler.__name__ = name
+    return handler
+
+
+def _stream_handler(name):
+    async def handler(self, request, context):
+        async for message in self._stream(name, request, context):
+            yield message
+    handler.__name__ = name
+    return handler
+
+
+def _install_handlers():
+    service = library_pb2.DESCRIPTOR.services_by_name['LibraryService']
+    for method in service.methods:
+        if method.name in AsyncLibraryServicer.__dict__:
+            continue
+        if method.client_streaming:
+            continue
+        if method.server_streaming:
+            factory = _stream_handler
+        else:
+            factory = _unary_handler
+        setattr(AsyncLibraryServicer, method.name, factory(method.name))
+
+
+_install_handlers()
+
+
+async def serve_async(address='[::]:50051', reuse_port=False, metrics_port=METRICS_PORT):
+    executor = futures.ThreadPoolExecutor(max_workers=ORM_WORKERS, thread_name_prefix='orm')
+    options = list(SERVER_OPTIONS)
+    if reuse_port:
+        options.append(('grpc.so_reuseport', 1))
+    interceptors = []
+    if metrics_port:
+        enable_metrics(metrics_port)
+        interceptors.append(AsyncMetricsInterceptor())
+    interceptors.append(AsyncAuthInterceptor())
+    if QUERY_STATS:
+        enable_query_stats()
+        interceptors.append(AsyncQueryStatsInterceptor())
+    enable_statement_deadlines()
+    server = grpc.aio.server(options=options, interceptors=interceptors)
+    library_pb2_grpc.add_LibraryServiceServicer_to_server(AsyncLibraryServicer(executor), server)
+    server.add_insecure_port(address)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor, SEARCH_INDEX.ensure_built, _search_index_rows)
+    print(f"Index de recherche prêt ({len(SEARCH_INDEX)} livres).")
+    if SEARCH_INDEX_REFRESH_SECONDS > 0:
+        start_search_index_refresher(SEARCH_INDEX_REFRESH_SECONDS)
+    if IDEMPOTENCY_PURGE_SECONDS > 0:
+        start_idempotency_purger(IDEMPOTENCY_PURGE_SECONDS)
+    await loop.run_in_executor(executor, start_hash_pool)
+    await server.start()
+    print(f"✅ SERVEUR gRPC (asyncio) DÉMARRÉ SUR {address} ({ORM_WORKERS} threads ORM, pid {os.getpid()})")
+
+    # SIGTERM (prefork.py, systemd, docker stop) comme Ctrl-C, cf. grpc_handler.serve().
+    def stop():
+        print("\n🛑 Arrêt du serveur...")
+        asyncio.ensure_future(server.stop(grace=SHUTDOWN_GRACE))
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop)
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(grace=SHUTDOWN_GRACE)
+        executor.shutdown(wait=False)
+        stop_hash_pool()
+
+
+if __name__ == '__main__':
+    asyncio.run(serve_async())
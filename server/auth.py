@@ -0,0 +1,221 @@
+"""
+Staff session tokens and password hashing for the library gRPC server.
+
+UserLogin checks the password once and returns a signed, expiring session
+token (django.core.signing: HMAC of SECRET_KEY, no database row). The
+client sends it back as `authorization: Bearer <token>` metadata and the
+auth interceptor only verifies the signature and its age, in memory.
+
+PBKDF2 is slow by design. Hashing runs in a pool of LIBRARY_HASH_WORKERS
+spawned processes, so a login storm no longer holds the GIL that
+BorrowBook needs, and at most LIBRARY_LOGIN_CONCURRENCY logins wait for it
+at once: beyond that UserLogin answers RESOURCE_EXHAUSTED instead of
+occupying every worker thread of the server. The servers stop the pool on
+SIGTERM/SIGINT (stop_hash_pool); a hashing process whose server died
+without stopping it (SIGKILL, crash) exits by itself.
+
+LIBRARY_AUTH_MODE:
+- required (default): every call needs a valid token, except UserLogin.
+  Creating a staff account (UpdateStaffProfile without staff_id) needs
+  one too, otherwise anyone could create an account and log in with it;
+- optional: calls without a token are accepted, an invalid or expired
+  token is refused (while clients are being upgraded);
+- off: no check.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent import futures
+
+import grpc
+from django.core import signing
+
+from interceptor_utils import method_name, rebuild_handler
+
+AUTH_MODE = os.environ.get('LIBRARY_AUTH_MODE', 'required')
+# Durée de validité d'un jeton (s) : une journée de travail par défaut.
+SESSION_TTL = int(os.environ.get('LIBRARY_SESSION_TTL', str(8 * 3600)))
+SESSION_SALT = 'library_system.session'
+AUTH_METADATA_KEY = 'authorization'
+_BEARER = 'Bearer '
+
+HASH_WORKERS = int(os.environ.get('LIBRARY_HASH_WORKERS', '2'))
+LOGIN_CONCURRENCY = int(os.environ.get('LIBRARY_LOGIN_CONCURRENCY', str(HASH_WORKERS * 4)))
+# Attente maximale (s) d'une place libre avant de refuser une connexion.
+LOGIN_WAIT = 1.0
+# Intervalle (s) de vérification, dans un processus de hachage, que le serveur vit encore.
+PARENT_POLL_SECONDS = 1.0
+
+# RPC accessibles sans jeton.
+EXEMPT_METHODS = frozenset({'UserLogin'})
+
+# ----------------------------------------------------
+# Session tokens
+# ----------------------------------------------------
+
+def issue_token(user):
+    """(jeton, expiration en secondes epoch) pour un utilisateur authentifié."""
+    token = signing.dumps({'uid': user.id}, salt=SESSION_SALT, compress=False)
+    return token, int(time.time()) + SESSION_TTL
+
+
+def token_user_id(token):
+    """Identifiant de l'utilisateur du jeton ; lève signing.BadSignature s'il est invalide ou expiré."""
+    return signing.loads(token, salt=SESSION_SALT, max_age=SESSION_TTL)['uid']
+
+
+def _bearer_token(handler_call_details):
+    for key, value in handler_call_details.invocation_metadata or ():
+        if key == AUTH_METADATA_KEY and value.startswith(_BEARER):
+            return value[len(_BEARER):]
+    return None
+
+
+def _rejection(handler_call_details):
+    """None si l'appel est autorisé, sinon (code, message) du refus."""
+    method = method_name(handler_call_details)
+    if AUTH_MODE == 'off' or method in EXEMPT_METHODS:
+        return None
+    token = _bearer_token(handler_call_details)
+    if token is None:
+        if AUTH_MODE == 'optional':
+            return None
+        return grpc.StatusCode.UNAUTHENTICATED, "Jeton de session requis."
+    try:
+        token_user_id(token)
+    except signing.SignatureExpired:
+        return grpc.StatusCode.UNAUTHENTICATED, "Session expirée, reconnectez-vous."
+    except signing.BadSignature:
+        return grpc.StatusCode.UNAUTHENTICATED, "Jeton de session invalide."
+    return None
+
+
+# ----------------------------------------------------
+# Password hashing process pool
+# ----------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+_login_slots = threading.BoundedSemaphore(max(1, LOGIN_CONCURRENCY))
+
+
+def _exit_with_parent(parent_pid):
+    # Sans cela, un worker dont le serveur a été tué resterait orphelin (rattaché
+    # au PID 1), avec Django chargé, en attente d'un travail qui ne viendra plus.
+    while os.getppid() == parent_pid:
+        time.sleep(PARENT_POLL_SECONDS)
+    os._exit(0)
+
+
+def _init_hash_worker(parent_pid):
+    import django
+    threading.Thread(target=_exit_with_parent, args=(parent_pid,), name='parent-watch', daemon=True).start()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_server.settings')
+    django.setup()
+
+
+def _check_password(password, encoded):
+    from django.contrib.auth.hashers import check_password, make_password
+    if encoded is None:
+        # Utilisateur inconnu : on hache quand même, comme ModelBackend, pour ne pas
+        # révéler par le temps de réponse qu'il n'existe pas.
+        make_password(password)
+        return False
+    return check_password(password, encoded)
+
+
+def _make_password(password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(password)
+
+
+def _hash_pool():
+    # "spawn", comme prefork.py : pas de fork d'un processus où gRPC tourne déjà.
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = futures.ProcessPoolExecutor(
+                    max_workers=max(1, HASH_WORKERS), mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_hash_worker, initargs=(os.getpid(),),
+                )
+    return _pool
+
+
+def start_hash_pool():
+    """Démarre les processus de hachage avant la première connexion (leur démarrage prend du temps)."""
+    pool = _hash_pool()
+    for job in [pool.submit(os.getpid) for _ in range(max(1, HASH_WORKERS))]:
+        job.result()
+
+
+def stop_hash_pool():
+    """Arrête les processus de hachage, en annulant les hachages en attente (arrêt du serveur)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def check_password(password, encoded):
+    """check_password() de Django exécuté dans le pool de hachage (sans mise à niveau du hash)."""
+    return _hash_pool().submit(_check_password, password, encoded).result()
+
+
+def make_password(password):
+    return _hash_pool().submit(_make_password, password).result()
+
+
+def acquire_login_slot():
+    """Réserve une place de connexion ; False si trop de connexions attendent déjà le hachage."""
+    return _login_slots.acquire(timeout=LOGIN_WAIT)
+
+
+def release_login_slot():
+    _login_slots.release()
+
+
+# ----------------------------------------------------
+# Thread-pool server
+# ----------------------------------------------------
+
+class AuthInterceptor(grpc.ServerInterceptor):
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        rejection = _rejection(handler_call_details)
+        if rejection is None:
+            return handler
+
+        def behavior(request, context):
+            context.abort(*rejection)
+        return rebuild_handler(handler, behavior)
+
+
+# ----------------------------------------------------
+# grpc.aio server
+# ----------------------------------------------------
+
+class AsyncAuthInterceptor(grpc.aio.ServerInterceptor):
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        rejection = _rejection(handler_call_details)
+        if rejection is None:
+            return handler
+        # Même forme que le handler remplacé : un flux de réponses (unary-stream,
+        # stream-stream) doit être un générateur asynchrone, sinon les intercepteurs
+        # placés avant (AsyncMetricsInterceptor) échouent sur « async for ».
+        if handler.response_streaming:
+            async def behavior(request_or_iterator, context):
+                await context.abort(*rejection)
+                yield  # jamais atteint : abort() lève une exception
+        else:
+            async def behavior(request_or_iterator, context):
+                await context.abort(*rejection)
+        return rebuild_handler(handler, behavior)
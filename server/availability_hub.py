@@ -0,0 +1,181 @@
+"""
+Fan-out hub behind the WatchAvailability RPC.
+
+Write RPCs publish `(book_id, available_copies, delta)` once their
+transaction commits; the hub forwards each event to the subscriptions
+that watch that book (or every book). Publishing only enqueues the event:
+a single dispatcher thread does the fan-out, so a BorrowBook never pays
+for thousands of watchers.
+
+Each subscription keeps at most one pending update per book. A consumer
+that falls behind therefore receives coalesced updates (latest stock, sum
+of the deltas) instead of a growing backlog; past `max_pending` distinct
+books, pending updates are dropped and the consumer is told to resync.
+
+Like the search index and the GetBook cache, the hub lives in the server
+process: with several workers (prefork.py), a watcher only sees the writes
+handled by its own worker.
+"""
+
+import queue
+import threading
+
+# Temps d'attente maximal d'un abonné synchrone avant de revérifier son contexte.
+WAIT_TIMEOUT = 1.0
+
+
+class Subscription:
+    """Updates pending for one watcher, coalesced per book."""
+
+    def __init__(self, book_ids, max_pending, loop=None):
+        self.book_ids = frozenset(book_ids)   # vide = tous les livres
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = {}                    # book_id -> (available_copies, delta)
+        self._resync = False
+        self._ready = False
+        self._closed = False
+        self._event = threading.Event()
+        self._loop = loop
+        self._async_event = None
+        if loop is not None:
+            import asyncio
+            self._async_event = asyncio.Event()
+        self.coalesced = self.dropped = 0
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def offer(self, book_id, available, delta):
+        with self._lock:
+            if self._closed:
+                return
+            previous = self._pending.get(book_id)
+            if previous is not None:
+                self._pending[book_id] = (available, previous[1] + delta)
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                # Consommateur trop lent : on abandonne tout et il relira l'état complet.
+                self.dropped += len(self._pending) + 1
+                self._pending.clear()
+                self._resync = True
+            else:
+                self._pending[book_id] = (available, delta)
+            self._wake()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            self._ready = False
+            self._wake()
+
+    def drain(self):
+        """Retourne `(resync, [(book_id, available_copies, delta), ...])` et vide la file."""
+        with self._lock:
+            updates = [(book_id, available, delta) for book_id, (available, delta) in self._pending.items()]
+            resync = self._resync
+            self._pending = {}
+            self._resync = False
+            self._ready = False
+            self._event.clear()
+            if self._async_event is not None:
+                self._async_event.clear()
+            return resync, updates
+
+    def wait(self, timeout=WAIT_TIMEOUT):
+        """Attente bloquante (serveur synchrone) ; renvoie ce que drain() renvoie."""
+        self._event.wait(timeout)
+        return self.drain()
+
+    async def wait_async(self):
+        """Attente sur la boucle asyncio passée à subscribe() (serveur grpc.aio)."""
+        await self._async_event.wait()
+        return self.drain()
+
+    # Appelé sous self._lock : on ne réveille le consommateur qu'une fois par lot.
+    def _wake(self):
+        if self._ready:
+            return
+        self._ready = True
+        self._event.set()
+        if self._async_event is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._async_event.set)
+            except RuntimeError:
+                # Boucle fermée : plus personne n'attend cet abonnement.
+                self._closed = True
+
+
+class AvailabilityHub:
+    """Registry of WatchAvailability subscriptions and their dispatcher thread."""
+
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._watch_all = set()
+        self._by_book = {}                    # book_id -> set(Subscription)
+        self._queue = queue.SimpleQueue()
+        self._dispatcher = None
+        self.published = 0
+
+    # --- Abonnements ---
+    def subscribe(self, book_ids=(), loop=None):
+        subscription = Subscription(book_ids, self.max_pending, loop)
+        with self._lock:
+            if subscription.book_ids:
+                for book_id in subscription.book_ids:
+                    self._by_book.setdefault(book_id, set()).add(subscription)
+            else:
+                self._watch_all.add(subscription)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name='availability-hub', daemon=True)
+                self._dispatcher.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self._watch_all.discard(subscription)
+            for book_id in subscription.book_ids:
+                watchers = self._by_book.get(book_id)
+                if watchers is not None:
+                    watchers.discard(subscription)
+                    if not watchers:
+                        del self._by_book[book_id]
+
+    def has_subscribers(self, book_id):
+        """Test sans verrou, pour éviter toute lecture du stock quand personne n'écoute."""
+        return bool(self._watch_all) or book_id in self._by_book
+
+    def __len__(self):
+        with self._lock:
+            return len(self._watch_all) + len({s for watchers in self._by_book.values() for s in watchers})
+
+    # --- Publication ---
+    def publish(self, book_id, available, delta):
+        if self.has_subscribers(book_id):
+            self._queue.put((book_id, available, delta))
+
+    def _dispatch(self):
+        while True:
+            book_id, available, delta = self._queue.get()
+            with self._lock:
+                targets = list(self._watch_all)
+                targets.extend(self._by_book.get(book_id, ()))
+            for subscription in targets:
+                subscription.offer(book_id, available, delta)
+            self.published += 1
+
+    def stats(self):
+        with self._lock:
+            subscriptions = set(self._watch_all)
+            for watchers in self._by_book.values():
+                subscriptions.update(watchers)
+        return {
+            'subscribers': len(subscriptions),
+            'published': self.published,
+            'coalesced': sum(s.coalesced for s in subscriptions),
+            'dropped': sum(s.dropped for s in subscriptions),
+        }
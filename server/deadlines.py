@@ -0,0 +1,149 @@
+"""
+Deadline propagation and cancellation for the library gRPC server.
+
+Work done for a caller that has already given up is pure waste, and under
+load it is what turns a slow backend into an outage. Three checks:
+
+- A call is not started when its deadline has already expired, or its
+  client has gone away, by the time a worker picks it up (a full thread
+  pool queues calls): DeadlineInterceptor for the thread-pool server,
+  aio_server._call/_stream for grpc.aio.
+- The deadline of the running call is kept in a ContextVar. A Django
+  execute_wrapper refuses to start a statement once it has passed and,
+  under MySQL, bounds each SELECT with a MAX_EXECUTION_TIME optimizer hint
+  derived from the time left (SQLite: a progress handler interrupts the
+  statement at the deadline).
+- Streaming RPCs check context.is_active() between chunks (see
+  grpc_handler._iter_keyset), so a cancelled stream stops reading the
+  database instead of preparing rows nobody will receive.
+
+    python manage.py bench_cancellation
+"""
+
+import contextvars
+import time
+
+import grpc
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.utils import OperationalError
+
+from interceptor_utils import inner_behavior, rebuild_handler
+
+# Marge sous laquelle un appel n'est plus commencé : il n'aurait pas le temps d'aboutir.
+MIN_REMAINING_SECONDS = 0.005
+# Instructions de la VM SQLite entre deux vérifications de l'échéance.
+SQLITE_PROGRESS_STEPS = 1000
+# Au-delà, l'appel est considéré sans délai (gRPC renvoie alors un temps restant « infini »).
+_NO_DEADLINE = 365 * 86400
+
+_deadline = contextvars.ContextVar('library_rpc_deadline', default=None)
+_enabled = False
+
+
+def _deadline_of(context):
+    """Échéance absolue (time.monotonic) de l'appel, ou None s'il n'a pas de délai."""
+    left = context.time_remaining()
+    if left is None or left > _NO_DEADLINE:
+        return None
+    return time.monotonic() + left
+
+
+def _dead(context):
+    """(code, message) si l'appel ne doit plus être traité, sinon None."""
+    if not context.is_active():
+        return grpc.StatusCode.CANCELLED, "Appel annulé par le client."
+    left = context.time_remaining()
+    if left is not None and left < MIN_REMAINING_SECONDS:
+        return grpc.StatusCode.DEADLINE_EXCEEDED, "Délai dépassé avant le traitement de l'appel."
+    return None
+
+
+def call_with_deadline(behavior, request, context):
+    """Exécute un handler unaire sauf si l'appel est déjà mort ; son délai borne le SQL exécuté."""
+    dead = _dead(context)
+    if dead:
+        context.abort(*dead)
+    token = _deadline.set(_deadline_of(context))
+    try:
+        return behavior(request, context)
+    finally:
+        _deadline.reset(token)
+
+
+def stream_with_deadline(behavior, request, context):
+    """Comme call_with_deadline(), pour un handler qui renvoie un flux."""
+    dead = _dead(context)
+    if dead:
+        context.abort(*dead)
+    deadline = _deadline_of(context)
+    token = _deadline.set(deadline)
+    try:
+        responses = iter(behavior(request, context))
+    finally:
+        _deadline.reset(token)
+    while True:
+        token = _deadline.set(deadline)
+        try:
+            response = next(responses)
+        except StopIteration:
+            return
+        finally:
+            _deadline.reset(token)
+        yield response
+
+
+def _limit_statement(execute, sql, params, many, context):
+    deadline = _deadline.get()
+    if deadline is None:
+        return execute(sql, params, many, context)
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise OperationalError("Délai de l'appel gRPC dépassé : requête non exécutée.")
+    vendor = context['connection'].vendor
+    if vendor == 'mysql':
+        statement = sql.lstrip()
+        if statement[:6].upper() == 'SELECT':
+            # Ignoré par MySQL hors des SELECT en lecture ; le serveur interrompt la requête à l'échéance.
+            sql = f"SELECT /*+ MAX_EXECUTION_TIME({max(1, int(left * 1000))}) */{statement[6:]}"
+    elif vendor == 'sqlite':
+        # Équivalent SQLite : la requête échoue (« interrupted ») dès l'échéance passée.
+        raw = context['connection'].connection
+        raw.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            raw.set_progress_handler(None, 0)
+    return execute(sql, params, many, context)
+
+
+def _install_wrapper(sender=None, connection=None, **kwargs):
+    if _limit_statement not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_limit_statement)
+
+
+def enable_statement_deadlines():
+    """Installe la limite de durée des requêtes sur chaque connexion (présente et à venir)."""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    connection_created.connect(_install_wrapper, dispatch_uid='library_statement_deadlines')
+    _install_wrapper(connection=connection)
+
+
+class DeadlineInterceptor(grpc.ServerInterceptor):
+    """Thread-pool server: the checks run in the worker thread, when the call really starts."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        inner = inner_behavior(handler)
+        if handler.response_streaming:
+            def behavior(request, context):
+                return stream_with_deadline(inner, request, context)
+        else:
+            def behavior(request, context):
+                return call_with_deadline(inner, request, context)
+        return rebuild_handler(handler, behavior)
@@ -1,13 +1,17 @@
 import grpc
 from concurrent import futures
+import base64
+import json
+from collections import OrderedDict
 import os
 import django
+import signal
 import sys
-from django.contrib.auth import authenticate 
-from django.contrib.auth.hashers import check_password, make_password
-from django.db.models import Q 
+import threading
+import time
+from django.db.models import Count, F, Q, Sum
 from django.db.utils import OperationalError
-from django.db import IntegrityError
+from django.db import DatabaseError, IntegrityError
 from django.db import transaction
 
 # ----------------------------------------------------
@@ -28,26 +32,423 @@ except Exception as e:
 # 2. Generated Code Imports
 # ----------------------------------------------------
 from django.contrib.auth.models import User
-from library_admin.models import Book, Loan, Member 
+from library_admin.models import Book, IdempotencyKey, Loan, Member 
 
 import library_pb2
 import library_pb2_grpc
+from auth import (
+    AuthInterceptor, acquire_login_slot, check_password, issue_token, make_password, release_login_slot,
+    start_hash_pool, stop_hash_pool,
+)
+from availability_hub import AvailabilityHub
+from deadlines import DeadlineInterceptor, enable_statement_deadlines
+from metrics import METRICS, MetricsInterceptor, start_metrics_server
+from query_stats import QueryStatsInterceptor, chunked_queries, enable_query_stats
+from search_index import BookSearchIndex, tokenize
 
 # ----------------------------------------------------
-# 3. The gRPC Servicer Implementation
+# 3. Keyset Pagination & Streaming Helpers
+# ----------------------------------------------------
+
+# Clé des trailing metadata qui transporte le curseur de la page suivante.
+NEXT_PAGE_TOKEN_KEY = 'next-page-token'
+MAX_PAGE_SIZE = 1000
+# Lignes lues par requête quand un flux complet est demandé (page_size = 0).
+STREAM_CHUNK_SIZE = int(os.environ.get('LIBRARY_STREAM_CHUNK', '1000'))
+# Lignes par message des RPC *Batched.
+DEFAULT_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 1000
+
+
+def _page_size(request):
+    """Taille de page demandée, plafonnée ; 0 signifie « tout le flux »."""
+    if request.page_size <= 0:
+        return 0
+    return min(request.page_size, MAX_PAGE_SIZE)
+
+
+def _encode_page_token(*values):
+    """Encode la clé de tri de la dernière ligne envoyée en curseur opaque."""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_page_token(token, context, arity):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != arity:
+        context.abort(grpc.StatusCode.INVALID_ARGUMENT, "page_token invalide.")
+    return values
+
+
+def _batch_size(request):
+    if request.batch_size <= 0:
+        return DEFAULT_BATCH_SIZE
+    return min(request.batch_size, MAX_BATCH_SIZE)
+
+
+def _batched(rows, size, new_batch, add_row):
+    """Regroupe les lignes en messages de `size` éléments ; `add_row(lot, ligne)` remplit le champ répété."""
+    batch, count = new_batch(), 0
+    for row in rows:
+        add_row(batch, row)
+        count += 1
+        if count == size:
+            yield batch
+            batch, count = new_batch(), 0
+    if count:
+        yield batch
+
+
+def _iter_keyset(rows, seek, key, page_size, context):
+    """
+    Parcourt `rows` (un values_list trié) sans jamais matérialiser le résultat.
+
+    Avec `page_size`, lit une page (plus une ligne pour savoir s'il en reste,
+    sans COUNT(*) ni OFFSET) et publie le curseur suivant dans les trailing
+    metadata. Sinon, enchaîne des requêtes keyset de STREAM_CHUNK_SIZE lignes :
+    `seek(rows, clé)` filtre après la clé de tri `key(ligne)` du lot précédent.
+    Aucun curseur SQL ne reste ouvert entre deux messages (iterator() ne
+    diffuse pas réellement sous MySQL et garderait la connexion occupée) et la
+    mémoire ne dépend que de la taille d'un lot. Le lot suivant n'est pas lu
+    si le client est parti entre-temps.
+    """
+    if page_size:
+        page = list(rows[:page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            context.set_trailing_metadata(
+                ((NEXT_PAGE_TOKEN_KEY, _encode_page_token(*key(page[-1]))),)
+            )
+        yield from page
+        return
+    chunk = list(rows[:STREAM_CHUNK_SIZE])
+    while chunk:
+        yield from chunk
+        if len(chunk) < STREAM_CHUNK_SIZE:
+            return
+        if not context.is_active():
+            return
+        last = key(chunk[-1])
+        chunk = None  # libère le lot avant de lire le suivant
+        with chunked_queries():
+            chunk = list(seek(rows, last)[:STREAM_CHUNK_SIZE])
+
+# ----------------------------------------------------
+# 4. Catalog Helpers (Bulk Import, Search Index, Cache & Watchers)
+# ----------------------------------------------------
+
+# Taille des lots d'insertion de CreateBooks (un bulk_create par transaction).
+BULK_CREATE_BATCH = 1000
+
+
+def _validate_book_row(request):
+    """Contrôles faits avant l'insertion pour qu'une ligne invalide n'annule pas tout le lot."""
+    if not request.title or not request.isbn:
+        return "Titre et ISBN obligatoires."
+    for field in ('title', 'author', 'isbn'):
+        max_length = Book._meta.get_field(field).max_length
+        if len(getattr(request, field)) > max_length:
+            return f"Champ '{field}' trop long (max {max_length})."
+    return None
+
+
+def _sort_row_errors(response):
+    """Erreurs d'un BulkCreateResponse dans l'ordre du flux (un lot rejette en plusieurs passes)."""
+    errors = sorted(response.errors, key=lambda error: error.index)
+    response.ClearField('errors')
+    response.errors.extend(errors)
+
+
+# Colonnes lues pour construire les messages (cf. LibraryServicer._book_message / _member_message).
+BOOK_FIELDS = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies', 'image', 'version')
+MEMBER_FIELDS = ('id', 'full_name', 'email', 'phone', 'date_joined', 'version')
+
+# Champ du message Book -> colonne lue, pour les masques de lecture (read_mask).
+BOOK_MASK_COLUMNS = {
+    'id': 'id', 'title': 'title', 'author': 'author', 'isbn': 'isbn',
+    'total_copies': 'total_copies', 'available_copies': 'available_copies', 'image_url': 'image',
+    'version': 'version',
+}
+
+
+def _book_projection(request, context):
+    """
+    Colonnes à lire et constructeur de message pour le read_mask de la requête.
+    id et title sont toujours lus et renvoyés : ce sont la clé de tri et de
+    curseur, et l'identité du livre côté client. Sans masque : tout le livre.
+    """
+    paths = list(dict.fromkeys(request.read_mask.paths))
+    if not paths:
+        return BOOK_FIELDS, LibraryServicer._book_message
+    unknown = [path for path in paths if path not in BOOK_MASK_COLUMNS]
+    if unknown:
+        context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"read_mask : champ(s) inconnu(s) {', '.join(unknown)}.")
+    paths = ['id', 'title'] + [path for path in paths if path not in ('id', 'title')]
+    columns = tuple(BOOK_MASK_COLUMNS[path] for path in paths)
+
+    def build(row, factory=library_pb2.Book):
+        return factory(**{path: (row[i] or "") if path == 'image_url' else row[i] for i, path in enumerate(paths)})
+    return columns, build
+
+# Champs modifiables par update_mask (UpdateBookAvailability / UpdateMember).
+BOOK_UPDATE_FIELDS = ('title', 'author', 'isbn', 'total_copies', 'available_copies', 'image_url')
+MEMBER_UPDATE_FIELDS = ('full_name', 'email', 'phone')
+
+
+def _update_paths(message, allowed, context):
+    """Champs à écrire : ceux de update_mask, ou tous les champs modifiables si le masque est vide."""
+    paths = list(dict.fromkeys(message.update_mask.paths))
+    unknown = [path for path in paths if path not in allowed]
+    if unknown:
+        context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                      f"update_mask : champ(s) non modifiable(s) {', '.join(unknown)}.")
+    return paths or list(allowed)
+
+
+def _version_conflict(context, message):
+    """
+    Échec du verrou optimiste : la ligne a changé depuis sa lecture par le
+    client. Statut ABORTED (relire puis réessayer), sans lever d'exception
+    pour ne pas être confondu avec une erreur dans les blocs try des RPC.
+    """
+    context.set_code(grpc.StatusCode.ABORTED)
+    context.set_details(message)
+    return library_pb2.StatusResponse(success=False, message=message)
+
+# Identifiants acceptés par appel de GetBooks / GetMembers (taille de la clause IN).
+MAX_IDS_PER_CALL = 1000
+
+
+def _requested_ids(request, context):
+    """Identifiants demandés, sans doublon et dans l'ordre ; refuse les listes trop longues."""
+    ids = list(dict.fromkeys(request.ids))
+    if len(ids) > MAX_IDS_PER_CALL:
+        context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                      f"{len(ids)} identifiants demandés (max {MAX_IDS_PER_CALL} par appel).")
+    return ids
+
+
+# Index plein texte du catalogue, partagé par tous les threads du serveur.
+SEARCH_INDEX = BookSearchIndex()
+SEARCH_FETCH_CHUNK = 500
+
+
+def _search_index_rows():
+    return Book.objects.values_list('id', 'title', 'author', 'isbn').iterator(chunk_size=5000)
+
+
+def _index_book(book):
+    transaction.on_commit(lambda: SEARCH_INDEX.upsert(book.id, book.title, book.author, book.isbn))
+
+
+def start_search_index_refresher(interval):
+    """
+    Reconstruit périodiquement l'index. Nécessaire quand plusieurs processus
+    servent le même port (prefork.py) : chacun ne voit que ses propres écritures.
+    """
+    from django.db import close_old_connections
+
+    def refresh():
+        while True:
+            time.sleep(interval)
+            try:
+                SEARCH_INDEX.rebuild(_search_index_rows())
+            except Exception as e:
+                print(f"Échec du rafraîchissement de l'index de recherche : {e}")
+            finally:
+                close_old_connections()
+
+    threading.Thread(target=refresh, name='search-index-refresh', daemon=True).start()
+
+
+class BookCache:
+    """
+    Read-through LRU/TTL cache of ((version, available_copies), serialized
+    library_pb2.Book) pairs.
+
+    Writers invalidate entries once their transaction commits. A load that
+    was already running when the invalidation happened is not stored, so a
+    stale row read just before a commit cannot re-enter the cache. With
+    several worker processes (prefork.py) each keeps its own cache and only
+    the TTL bounds how long another worker's write stays invisible.
+    """
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # book_id -> (expires_at, (etag, bytes))
+        self._loading = {}              # book_id -> jeton du chargement en cours
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, book_id, loader):
+        """Retourne l'entrée en cache, ou appelle `loader()` (None = introuvable, non mis en cache)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(book_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(book_id)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(book_id, None)
+            self.misses += 1
+            token = self._loading[book_id] = object()
+        data = loader()
+        with self._lock:
+            if self._loading.get(book_id) is token:
+                del self._loading[book_id]
+                if data is not None and self.ttl > 0:
+                    self._entries[book_id] = (time.monotonic() + self.ttl, data)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        return data
+
+    def invalidate(self, book_id):
+        with self._lock:
+            self._entries.pop(book_id, None)
+            self._loading.pop(book_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries), 'max_entries': self.max_entries,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'invalidations': self.invalidations,
+            }
+
+
+# Sous prefork.py, LIBRARY_BOOK_CACHE_TTL borne la durée pendant laquelle l'écriture
+# d'un autre worker reste invisible (2 s par défaut) ; 0 désactive le cache.
+BOOK_CACHE = BookCache(
+    max_entries=int(os.environ.get('LIBRARY_BOOK_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('LIBRARY_BOOK_CACHE_TTL', '30')),
+)
+
+
+def _invalidate_book(book_id):
+    transaction.on_commit(lambda: BOOK_CACHE.invalidate(book_id))
+
+
+# Abonnés de WatchAvailability ; au-delà de N livres en attente, un abonné lent est resynchronisé.
+AVAILABILITY_HUB = AvailabilityHub(max_pending=int(os.environ.get('LIBRARY_WATCH_MAX_PENDING', '1000')))
+# Serveur à pool de threads : chaque abonné y occupe un thread pendant tout le flux.
+# Au-delà de cette limite, bien en dessous de SERVER_WORKERS, l'abonnement est
+# refusé (RESOURCE_EXHAUSTED) pour que les autres RPC gardent des threads.
+# aio_server.py n'a pas cette limite.
+WATCH_THREAD_LIMIT = int(os.environ.get('LIBRARY_WATCH_THREADS', '2'))
+_watch_slots = threading.BoundedSemaphore(max(1, WATCH_THREAD_LIMIT))
+
+
+def _publish_availability(book_id, delta, available=None):
+    """
+    Notifie les abonnés au COMMIT. Appelé juste après l'UPDATE du livre,
+    dont la ligne est encore verrouillée : le stock relu est exactement celui
+    de cette transaction. Sans abonné, aucune requête n'est faite.
+    """
+    if not delta or not AVAILABILITY_HUB.has_subscribers(book_id):
+        return
+    if available is None:
+        available = Book.objects.filter(id=book_id).values_list('available_copies', flat=True).first()
+        if available is None:
+            return
+    transaction.on_commit(lambda: AVAILABILITY_HUB.publish(book_id, available, delta))
+
+
+# Durée de conservation des clés d'idempotence (s) et intervalle de leur purge.
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('LIBRARY_IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_PURGE_SECONDS = int(os.environ.get('LIBRARY_IDEMPOTENCY_PURGE', '3600'))
+MAX_REQUEST_ID_LENGTH = 64
+
+
+def _stored_response(key):
+    data = IdempotencyKey.objects.filter(key=key).values_list('response', flat=True).first()
+    return library_pb2.StatusResponse.FromString(bytes(data)) if data is not None else None
+
+
+def _idempotent(method, request_id, context, run):
+    """
+    Exécute la mutation `run()` au plus une fois par request_id. Une réponse
+    réussie est enregistrée dans la même transaction que la mutation : une
+    requête rejouée (retry après un timeout, requête hedgée) reçoit la réponse
+    d'origine. Un échec n'a rien modifié ; il n'est pas enregistré et peut
+    être rejoué, sauf si la même clé a réussi en parallèle : c'est alors la
+    réponse enregistrée qui est renvoyée. Sans request_id, `run()` est
+    simplement appelé.
+    """
+    if not request_id:
+        return run()
+    if len(request_id) > MAX_REQUEST_ID_LENGTH:
+        context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                      f"request_id trop long (max {MAX_REQUEST_ID_LENGTH} caractères).")
+    key = f"{method}:{request_id}"
+    stored = _stored_response(key)
+    if stored is not None:
+        return stored
+    try:
+        with transaction.atomic():
+            response = run()
+            if response.success:
+                IdempotencyKey.objects.create(key=key, response=response.SerializeToString())
+        if not response.success:
+            # Échec peut-être dû à une requête jumelle validée entre-temps (ex. « ISBN déjà
+            # existant » pour CreateBook) : sa réponse enregistrée fait foi.
+            return _stored_response(key) or response
+        return response
+    except IntegrityError:
+        # Même clé traitée en parallèle (hedging) : l'autre requête a validé en premier,
+        # tout ce que celle-ci a fait est annulé.
+        return _stored_response(key) or library_pb2.StatusResponse(
+            success=False, message="Requête déjà en cours de traitement.")
+
+
+def start_idempotency_purger(interval):
+    """Supprime périodiquement les clés d'idempotence plus anciennes que IDEMPOTENCY_TTL_SECONDS."""
+    from datetime import timedelta
+    from django.db import close_old_connections
+    from django.utils import timezone
+
+    def purge():
+        while True:
+            try:
+                cutoff = timezone.now() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+                IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+            except Exception as e:
+                print(f"Échec de la purge des clés d'idempotence : {e}")
+            finally:
+                close_old_connections()
+            time.sleep(interval)
+
+    threading.Thread(target=purge, name='idempotency-purge', daemon=True).start()
+
+# ----------------------------------------------------
+# 5. The gRPC Servicer Implementation
 # ----------------------------------------------------
 
 class LibraryServicer(library_pb2_grpc.LibraryServiceServicer):
     
     # --- A. Authentication ---
+    # Le mot de passe est vérifié dans le pool de hachage (auth.py) ; les appels
+    # suivants ne présentent que le jeton de session renvoyé ici.
     def UserLogin(self, request, context):
-        user = authenticate(username=request.username, password=request.password)
+        if not acquire_login_slot():
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                          "Trop de connexions simultanées, réessayez dans un instant.")
+        try:
+            user = User.objects.filter(username=request.username).first()
+            valid = check_password(request.password, user.password if user else None)
+        finally:
+            release_login_slot()
         response = library_pb2.LoginResponse()
-        if user is not None and user.is_active:
+        if valid and user.is_active:
             if user.is_staff or user.is_superuser:
                 response.success = True
                 response.user_id = str(user.id) 
                 response.message = f"Staff login successful: {user.username}"
+                response.session_token, response.expires_at = issue_token(user)
             else:
                 response.success = False
                 response.message = "Access Denied: Account lacks staff privileges."
@@ -58,39 +459,142 @@ class LibraryServicer(library_pb2_grpc.LibraryServiceServicer):
 
     # --- B. Inventory Management ---
     def CreateBook(self, request, context):
+        return _idempotent('CreateBook', request.request_id, context, lambda: self._create_book(request))
+
+    def _create_book(self, request):
         try:
             total_qty = request.total_copies if request.total_copies > 0 else 1
-            new_book = Book.objects.create(
-                title=request.title,
-                author=request.author,
-                isbn=request.isbn,
-                total_copies=total_qty,
-                available_copies=total_qty, 
-                image=request.image_url if request.image_url else None
-            )
+            # Point de sauvegarde : un ISBN en double n'annule pas la transaction englobante.
+            with transaction.atomic():
+                new_book = Book.objects.create(
+                    title=request.title,
+                    author=request.author,
+                    isbn=request.isbn,
+                    total_copies=total_qty,
+                    available_copies=total_qty, 
+                    image=request.image_url if request.image_url else None
+                )
+            _index_book(new_book)
             return library_pb2.StatusResponse(success=True, message=f"Book created.", entity_id=new_book.id)
         except IntegrityError:
             return library_pb2.StatusResponse(success=False, message="ISBN already exists.")
         except Exception as e:
             return library_pb2.StatusResponse(success=False, message=str(e))
 
+    def CreateBooks(self, request_iterator, context):
+        """Import en masse : les livres reçus sont insérés par lots de BULK_CREATE_BATCH."""
+        response = library_pb2.BulkCreateResponse()
+        batch = []
+        for index, request in enumerate(request_iterator):
+            batch.append((index, request))
+            if len(batch) >= BULK_CREATE_BATCH:
+                self._create_book_batch(batch, response)
+                batch = []
+        if batch:
+            self._create_book_batch(batch, response)
+        _sort_row_errors(response)
+        return response
+
+    @chunked_queries()
+    def _create_book_batch(self, batch, response):
+        def reject(index, isbn, message):
+            response.failed += 1
+            response.errors.add(index=index, isbn=isbn, message=message)
+
+        candidates = []
+        seen_isbns = set()
+        for index, request in batch:
+            error = _validate_book_row(request)
+            if error:
+                reject(index, request.isbn, error)
+            elif request.isbn in seen_isbns:
+                reject(index, request.isbn, "ISBN en double dans l'import.")
+            else:
+                seen_isbns.add(request.isbn)
+                candidates.append((index, request))
+
+        existing = set(Book.objects.filter(isbn__in=seen_isbns).values_list('isbn', flat=True))
+        rows = []
+        for index, request in candidates:
+            if request.isbn in existing:
+                reject(index, request.isbn, "ISBN already exists.")
+                continue
+            total_qty = request.total_copies if request.total_copies > 0 else 1
+            rows.append((index, Book(
+                title=request.title, author=request.author, isbn=request.isbn,
+                total_copies=total_qty, available_copies=total_qty,
+                image=request.image_url if request.image_url else None,
+            )))
+
+        created_isbns = []
+        try:
+            with transaction.atomic():
+                Book.objects.bulk_create([book for _, book in rows])
+            created_isbns = [book.isbn for _, book in rows]
+        except DatabaseError:
+            # Conflit concurrent (un autre import a pris un ISBN entre-temps) :
+            # on rejoue le lot ligne par ligne pour n'écarter que les fautifs.
+            for index, book in rows:
+                try:
+                    with transaction.atomic():
+                        book.save()
+                    created_isbns.append(book.isbn)
+                except IntegrityError:
+                    reject(index, book.isbn, "ISBN already exists.")
+                except DatabaseError as e:
+                    reject(index, book.isbn, str(e))
+        response.created += len(created_isbns)
+
+        # bulk_create ne renvoie pas les ids sous MySQL : on les relit pour l'index.
+        for book_id, title, author, isbn in Book.objects.filter(isbn__in=created_isbns).values_list(
+                'id', 'title', 'author', 'isbn'):
+            SEARCH_INDEX.upsert(book_id, title, author, isbn)
+
     def UpdateBookAvailability(self, request, context):
+        """
+        Mise à jour partielle : un seul UPDATE des colonnes de update_mask, sans
+        SELECT préalable. Un stock absent du masque n'est pas réécrit, et ne
+        peut donc plus écraser un emprunt ou un retour concurrent.
+        Avec request.version, l'UPDATE est conditionnel (WHERE version = ?) :
+        une fiche modifiée entre-temps par un autre éditeur renvoie ABORTED au
+        lieu d'être écrasée. Les emprunts et retours ne changent pas la version
+        (une correction de titre n'échoue pas à cause d'un prêt) ; une écriture
+        de available_copies est donc aussi conditionnée au stock lu par le
+        client (expected_available_copies).
+        """
+        paths = _update_paths(request, BOOK_UPDATE_FIELDS, context)
+        if not request.update_mask.paths and not request.image_url:
+            paths.remove('image_url')
+        values = {BOOK_MASK_COLUMNS[path]: getattr(request, path) for path in paths}
+        if 'image' in values:
+            values['image'] = values['image'] or None
         try:
-            book = Book.objects.get(id=request.id)
-            book.title = request.title
-            book.author = request.author
-            book.isbn = request.isbn
-            book.total_copies = request.total_copies
-            book.available_copies = request.available_copies
-            
-            if request.image_url:
-                book.image = request.image_url
-            
-            book.save()
-      
+            with transaction.atomic():
+                # Ancien stock relu (et verrouillé) seulement s'il faut notifier des abonnés.
+                previous = None
+                if 'available_copies' in values and AVAILABILITY_HUB.has_subscribers(request.id):
+                    previous = Book.objects.select_for_update().filter(id=request.id).values_list(
+                        'available_copies', flat=True).first()
+                books = Book.objects.filter(id=request.id)
+                target = books.filter(version=request.version) if request.version else books
+                checked = bool(request.version)
+                if 'available_copies' in values and request.HasField('expected_available_copies'):
+                    target = target.filter(available_copies=request.expected_available_copies)
+                    checked = True
+                if not target.update(**values, version=F('version') + 1):
+                    if checked and books.exists():
+                        return _version_conflict(context, "Le livre a été modifié entre-temps ; rechargez la fiche.")
+                    return library_pb2.StatusResponse(success=False, message="Livre introuvable.")
+                if {'title', 'author', 'isbn'} & values.keys():
+                    # Les champs absents (None) gardent leur valeur indexée.
+                    _index_book(Book(id=request.id, title=values.get('title'),
+                                     author=values.get('author'), isbn=values.get('isbn')))
+                _invalidate_book(request.id)
+                if previous is not None:
+                    available = values['available_copies']
+                    _publish_availability(request.id, available - previous, available)
             return library_pb2.StatusResponse(success=True, message="Livre mis à jour.")
         except Exception as e:
-  
             return library_pb2.StatusResponse(success=False, message=str(e))
 
     def DeleteBook(self, request, context):
@@ -98,33 +602,130 @@ class LibraryServicer(library_pb2_grpc.LibraryServiceServicer):
             book_id = int(request.query)
             book = Book.objects.get(id=book_id)
             book.delete()
+            transaction.on_commit(lambda: SEARCH_INDEX.remove(book_id))
+            _invalidate_book(book_id)
             return library_pb2.StatusResponse(success=True, message="Livre supprimé avec succès.")
         except Exception as e:
             return library_pb2.StatusResponse(success=False, message=str(e))
 
     def GetBook(self, request, context):
+        """
+        Lecture via BOOK_CACHE. Le contenu d'un livre est déterminé par
+        (version, available_copies) : les emprunts et retours ne changent que le
+        stock. Une lecture conditionnelle (if_version, if_available_copies)
+        relit ce couple en base (requête par clé primaire) : le cache est propre
+        au processus et, sous prefork.py, peut ignorer l'écriture d'un autre
+        worker pendant LIBRARY_BOOK_CACHE_TTL. Seule une lecture simple peut donc
+        renvoyer un livre périmé, dans cette limite.
+        """
         try:
-            book = Book.objects.get(id=int(request.query))
-            return library_pb2.Book(
-                id=book.id, title=book.title, author=book.author,
-                isbn=book.isbn, total_copies=book.total_copies,
-                available_copies=book.available_copies,
-                image_url=str(book.image) if book.image else ""
-            )
+            book_id = int(request.query)
+            load = lambda: self._load_book(book_id)
+            if request.if_version:
+                current = Book.objects.filter(id=book_id).values_list('version', 'available_copies').first()
+                if (current is not None and request.HasField('if_available_copies')
+                        and current == (request.if_version, request.if_available_copies)):
+                    # Le client a déjà cette version, rien à renvoyer.
+                    return library_pb2.Book(id=book_id, version=current[0], available_copies=current[1],
+                                            not_modified=True)
+                entry = BOOK_CACHE.get(book_id, load) if current is not None else None
+                if entry is not None and entry[0] != current:
+                    # Entrée écrite avant une modification faite par un autre worker.
+                    BOOK_CACHE.invalidate(book_id)
+                    entry = BOOK_CACHE.get(book_id, load)
+            else:
+                entry = BOOK_CACHE.get(book_id, load)
         except Exception:
+            entry = None
+        if entry is None:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             return library_pb2.Book()
+        return library_pb2.Book.FromString(entry[1])
+
+    def _load_book(self, book_id):
+        row = Book.objects.filter(id=book_id).values_list(*BOOK_FIELDS).first()
+        if row is None:
+            return None
+        # Clé de validation (version, available_copies), cf. GetBook.
+        return (row[-1], row[5]), self._book_message(row).SerializeToString()
+
+    def GetBooks(self, request, context):
+        """Plusieurs livres en une requête id IN (...) ; les ids inconnus sont listés dans missing_ids."""
+        ids = _requested_ids(request, context)
+        response = library_pb2.BookList()
+        if ids:
+            rows = {row[0]: row for row in Book.objects.filter(id__in=ids).values_list(*BOOK_FIELDS)}
+            for book_id in ids:
+                if book_id in rows:
+                    self._book_message(rows[book_id], response.books.add)
+                else:
+                    response.missing_ids.append(book_id)
+        return response
 
     # --- C. Search ---SearchBooks
     def SearchBooks(self, request, context):
-        query = request.query
-        books = Book.objects.filter(Q(title__icontains=query) | Q(author__icontains=query)).order_by('title')
-        for book in books:
-            yield library_pb2.Book(
-                id=book.id, title=book.title, author=book.author, isbn=book.isbn,
-                total_copies=book.total_copies, available_copies=book.available_copies,
-                image_url=str(book.image) if book.image else ""
-            )
+        columns, build = _book_projection(request, context)
+        for row in self._book_rows(request, context, columns):
+            yield build(row)
+
+    def SearchBooksBatched(self, request, context):
+        """Même résultat que SearchBooks, par lots de batch_size livres par message."""
+        columns, build = _book_projection(request, context)
+        yield from _batched(self._book_rows(request, context, columns), _batch_size(request), library_pb2.BookBatch,
+                            lambda batch, row: build(row, batch.books.add))
+
+    def _book_rows(self, request, context, columns=BOOK_FIELDS):
+        """Lignes values_list(*columns) ; columns commence toujours par ('id', 'title')."""
+        if tokenize(request.query):
+            return self._search_ranked(request, context, columns)
+        if request.query.strip():
+            # Requête sans aucun mot cherchable (« !!! », « -- ») : aucun résultat.
+            return iter(())
+        # Requête vide : parcours du catalogue par ordre alphabétique.
+        books = Book.objects.order_by('title', 'id').values_list(*columns)
+        if request.page_token:
+            books = self._seek_books(books, _decode_page_token(request.page_token, context, 2))
+        return _iter_keyset(books, self._seek_books, lambda row: (row[1], row[0]), _page_size(request), context)
+
+    @staticmethod
+    def _seek_books(books, key):
+        # Seek sur (title, id) : le coût d'une page ne dépend pas de sa position.
+        last_title, last_id = key
+        return books.filter(Q(title__gte=last_title) & (Q(title__gt=last_title) | Q(id__gt=last_id)))
+
+    def _search_ranked(self, request, context, columns=BOOK_FIELDS):
+        """Recherche plein texte via l'index inversé, résultats classés par pertinence."""
+        SEARCH_INDEX.ensure_built(_search_index_rows)
+        after = _decode_page_token(request.page_token, context, 3) if request.page_token else None
+        page_size = _page_size(request)
+        keys = SEARCH_INDEX.search(request.query, after=after, limit=page_size + 1 if page_size else None)
+        if page_size and len(keys) > page_size:
+            keys = keys[:page_size]
+            context.set_trailing_metadata(((NEXT_PAGE_TOKEN_KEY, _encode_page_token(*keys[-1])),))
+        for start in range(0, len(keys), SEARCH_FETCH_CHUNK):
+            if start and not context.is_active():
+                return
+            ids = [key[2] for key in keys[start:start + SEARCH_FETCH_CHUNK]]
+            with chunked_queries():
+                books = {row[0]: row for row in Book.objects.filter(id__in=ids).values_list(*columns)}
+            for book_id in ids:
+                # Un livre supprimé entre-temps est simplement ignoré.
+                if book_id in books:
+                    yield books[book_id]
+
+    @staticmethod
+    def _book_message(row, factory=library_pb2.Book):
+        """
+        Construit le message à partir d'une ligne values_list(*BOOK_FIELDS), sans
+        instance de modèle. `factory` peut être `lot.books.add` pour remplir un BookBatch
+        directement, sans copie.
+        """
+        book_id, title, author, isbn, total_copies, available_copies, image, version = row
+        return factory(
+            id=book_id, title=title, author=author, isbn=isbn,
+            total_copies=total_copies, available_copies=available_copies,
+            image_url=image or "", version=version
+        )
 
     # --- D. Members ---
     def CreateMember(self, request, context):
@@ -135,28 +736,72 @@ class LibraryServicer(library_pb2_grpc.LibraryServiceServicer):
             return library_pb2.StatusResponse(success=False, message=str(e))
 
     def GetAllMembers(self, request, context):
-        members = Member.objects.all().order_by('-id')
-        for m in members:
-            yield library_pb2.Member(
-                id=str(m.id), full_name=m.full_name, email=m.email, phone=m.phone,
-                date_joined=m.date_joined.isoformat() if m.date_joined else ""
-            )
+        for row in self._member_rows(request, context):
+            yield self._member_message(row)
+
+    def GetAllMembersBatched(self, request, context):
+        """Même résultat que GetAllMembers, par lots de batch_size membres par message."""
+        yield from _batched(self._member_rows(request, context), _batch_size(request), library_pb2.MemberBatch,
+                            lambda batch, row: self._member_message(row, batch.members.add))
+
+    def _member_rows(self, request, context):
+        members = Member.objects.order_by('-id')
+        if request.query:
+            members = members.filter(Q(full_name__icontains=request.query) | Q(email__icontains=request.query))
+        if request.borrowing_book_id:
+            # Sous-requête sur l'index (book, member, returned_date) des prêts.
+            members = members.filter(id__in=Loan.objects.filter(
+                book_id=request.borrowing_book_id, returned_date__isnull=True).values('member_id'))
+        members = members.values_list(*MEMBER_FIELDS)
+        seek = lambda rows, key: rows.filter(id__lt=key[0])
+        if request.page_token:
+            members = seek(members, _decode_page_token(request.page_token, context, 1))
+        return _iter_keyset(members, seek, lambda row: (row[0],), _page_size(request), context)
+
+    @staticmethod
+    def _member_message(row, factory=library_pb2.Member):
+        member_id, full_name, email, phone, date_joined, version = row
+        return factory(
+            id=str(member_id), full_name=full_name, email=email, phone=phone or "",
+            date_joined=date_joined.isoformat() if date_joined else "", version=version
+        )
 
     def GetMemberDetail(self, request, context):
+        """Avec if_version égal à la version courante, ne renvoie que id, version et not_modified."""
         try:
-            m = Member.objects.get(id=int(request.user_id))
-            return library_pb2.Member(id=str(m.id), full_name=m.full_name, email=m.email, phone=m.phone)
+            row = Member.objects.filter(id=int(request.user_id)).values_list(*MEMBER_FIELDS).first()
         except Exception:
+            row = None
+        if row is None:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             return library_pb2.Member()
+        if request.if_version and request.if_version == row[-1]:
+            return library_pb2.Member(id=str(row[0]), version=row[-1], not_modified=True)
+        return self._member_message(row)
+
+    def GetMembers(self, request, context):
+        """Plusieurs membres en une requête id IN (...) ; les ids inconnus sont listés dans missing_ids."""
+        ids = _requested_ids(request, context)
+        response = library_pb2.MemberList()
+        if ids:
+            rows = {row[0]: row for row in Member.objects.filter(id__in=ids).values_list(*MEMBER_FIELDS)}
+            for member_id in ids:
+                if member_id in rows:
+                    self._member_message(rows[member_id], response.members.add)
+                else:
+                    response.missing_ids.append(member_id)
+        return response
 
     def UpdateMember(self, request, context):
+        """Comme UpdateBookAvailability : un seul UPDATE des champs de update_mask, conditionné à la version."""
+        paths = _update_paths(request, MEMBER_UPDATE_FIELDS, context)
         try:
-            member = Member.objects.get(id=int(request.id))
-            member.full_name = request.full_name
-            member.email = request.email
-            member.phone = request.phone
-            member.save()
+            members = Member.objects.filter(id=int(request.id))
+            target = members.filter(version=request.version) if request.version else members
+            if not target.update(**{path: getattr(request, path) for path in paths}, version=F('version') + 1):
+                if request.version and members.exists():
+                    return _version_conflict(context, "Le membre a été modifié entre-temps ; rechargez la fiche.")
+                return library_pb2.StatusResponse(success=False, message="Membre introuvable.")
             return library_pb2.StatusResponse(success=True, message="Membre mis à jour.")
         except Exception as e:
             return library_pb2.StatusResponse(success=False, message=str(e))
@@ -170,46 +815,83 @@ class LibraryServicer(library_pb2_grpc.LibraryServiceServicer):
             return library_pb2.StatusResponse(success=False, message=str(e))
 
     # --- E. Borrow & Return ---
+    # Le stock est modifié par des UPDATE conditionnels
+    # (available_copies = available_copies - 1 WHERE available_copies > 0) :
+    # le verrou de ligne du livre n'est tenu que de cet UPDATE jusqu'au COMMIT,
+    # sans SELECT ... FOR UPDATE préalable. Le livre est toujours verrouillé
+    # avant le prêt, dans les deux RPC, pour éviter les interblocages.
     def BorrowBook(self, request, context):
+        return _idempotent('BorrowBook', request.request_id, context, lambda: self._borrow_book(request))
+
+    def _borrow_book(self, request):
         try:
             from django.utils import timezone
             from datetime import timedelta
+            book_id = int(request.book_id)
+            member_id = int(request.member_id)
+            # Vérification hors transaction : aucun verrou n'est encore pris.
+            if not Member.objects.filter(id=member_id).exists():
+                return library_pb2.StatusResponse(success=False, message="Membre introuvable.")
             with transaction.atomic():
-                book = Book.objects.select_for_update().get(id=int(request.book_id))
-                if book.available_copies <= 0:
-                    return library_pb2.StatusResponse(success=False, message="Stock épuisé.")
-                member = Member.objects.get(id=int(request.member_id))
-                Loan.objects.create(book=book, member=member, due_date=timezone.now().date() + timedelta(days=14))
-                book.available_copies -= 1
-                book.save()
-                return library_pb2.StatusResponse(success=True, message="Emprunt réussi.")
+                taken = Book.objects.filter(id=book_id, available_copies__gt=0).update(
+                    available_copies=F('available_copies') - 1
+                )
+                if not taken:
+                    if Book.objects.filter(id=book_id).exists():
+                        return library_pb2.StatusResponse(success=False, message="Stock épuisé.")
+                    return library_pb2.StatusResponse(success=False, message="Livre introuvable.")
+                _invalidate_book(book_id)
+                _publish_availability(book_id, -1)
+                # L'INSERT vient après l'UPDATE : la vérification de clé étrangère
+                # ne prend pas de verrou partagé qu'un autre emprunt voudrait promouvoir.
+                Loan.objects.create(book_id=book_id, member_id=member_id,
+                                    due_date=timezone.now().date() + timedelta(days=14))
+            return library_pb2.StatusResponse(success=True, message="Emprunt réussi.")
         except Exception as e:
             return library_pb2.StatusResponse(success=False, message=str(e))
 
     def ReturnBook(self, request, context):
+        return _idempotent('ReturnBook', request.request_id, context, lambda: self._return_book(request))
+
+    def _return_book(self, request):
         try:
             from django.utils import timezone
+            book_id = int(request.book_id)
+            loan_id = Loan.objects.filter(
+                book_id=book_id, member_id=int(request.member_id), returned_date__isnull=True
+            ).values_list('id', flat=True).first()
+            if loan_id is None:
+                return library_pb2.StatusResponse(success=False, message="Aucun prêt actif.")
             with transaction.atomic():
-                loan = Loan.objects.filter(book_id=request.book_id, member_id=int(request.member_id), returned_date__isnull=True).first()
-                if not loan:
+                Book.objects.filter(id=book_id).update(available_copies=F('available_copies') + 1)
+                _invalidate_book(book_id)
+                # Le filtre returned_date__isnull protège d'un double retour concurrent.
+                closed = Loan.objects.filter(id=loan_id, returned_date__isnull=True).update(
+                    returned_date=timezone.now().date()
+                )
+                if not closed:
+                    transaction.set_rollback(True)
                     return library_pb2.StatusResponse(success=False, message="Aucun prêt actif.")
-                loan.returned_date = timezone.now().date()
-                loan.save()
-                book = loan.book
-                book.available_copies += 1
-                book.save()
-                return library_pb2.StatusResponse(success=True, message="Livre retourné.")
+                _publish_availability(book_id, +1)
+            return library_pb2.StatusResponse(success=True, message="Livre retourné.")
         except Exception as e:
             return library_pb2.StatusResponse(success=False, message=str(e))
 
     # --- F. Staff Management ---
     def GetAllUsers(self, request, context):
-        users = User.objects.filter(Q(is_staff=True) | Q(is_superuser=True)).order_by('username')
-        for user in users:
+        users = User.objects.filter(Q(is_staff=True) | Q(is_superuser=True)).order_by('username').values_list(
+            'id', 'username', 'email', 'is_staff', 'is_active', 'date_joined', 'is_superuser'
+        )
+        # username est unique : il suffit comme clé de tri et de curseur.
+        seek = lambda rows, key: rows.filter(username__gt=key[0])
+        if request.page_token:
+            users = seek(users, _decode_page_token(request.page_token, context, 1))
+        for user_id, username, email, is_staff, is_active, date_joined, is_superuser in _iter_keyset(
+                users, seek, lambda row: (row[1],), _page_size(request), context):
             yield library_pb2.UserDetail(
-                user_id=str(user.id), username=user.username, email=user.email,
-                is_staff=user.is_staff, is_active=user.is_active,
-                date_joined=user.date_joined.isoformat(), is_superuser=user.is_superuser
+                user_id=str(user_id), username=username, email=email,
+                is_staff=is_staff, is_active=is_active,
+                date_joined=date_joined.isoformat(), is_superuser=is_superuser
             )
 
     def GetUserDetail(self, request, context):
@@ -238,10 +920,13 @@ class LibraryServicer(library_pb2_grpc.LibraryServiceServicer):
         # MODE CRÉATION
         if not request.staff_id:
             try:
-                user = User.objects.create_user(
-                    username=request.new_username, email=request.new_email,
-                    password=request.new_password, is_staff=True, is_active=True
+                # Comme User.objects.create_user(), avec le hachage fait dans le pool.
+                user = User(
+                    username=User.normalize_username(request.new_username),
+                    email=User.objects.normalize_email(request.new_email),
+                    password=make_password(request.new_password), is_staff=True, is_active=True
                 )
+                user.save()
                 response.success = True
                 response.message = f"Utilisateur '{user.username}' créé."
                 response.entity_id = user.id
@@ -268,21 +953,140 @@ class LibraryServicer(library_pb2_grpc.LibraryServiceServicer):
             response.message = str(e)
         return response
 
+    # --- G. Dashboard Statistics ---
+    def GetLibraryStats(self, request, context):
+        from django.utils import timezone
+        today = timezone.now().date()
+        books = Book.objects.aggregate(
+            titles=Count('id'),
+            total=Sum('total_copies'),
+            available=Sum('available_copies'),
+        )
+        loans = Loan.objects.filter(returned_date__isnull=True).aggregate(
+            active=Count('id'),
+            overdue=Count('id', filter=Q(due_date__lt=today)),
+        )
+        total = books['total'] or 0
+        available = books['available'] or 0
+        return library_pb2.LibraryStats(
+            total_titles=books['titles'],
+            total_copies=total,
+            available_copies=available,
+            borrowed_copies=total - available,
+            active_loans=loans['active'],
+            overdue_loans=loans['overdue'],
+            total_members=Member.objects.count(),
+        )
+
+    # --- H. Live Availability ---
+    # Chaque abonné occupe un thread du pool tant que le flux est ouvert, d'où
+    # WATCH_THREAD_LIMIT abonnés au plus : pour des milliers d'abonnés, utiliser
+    # aio_server.py (version asynchrone, qui remplace cette méthode).
+    def WatchAvailability(self, request, context):
+        if not _watch_slots.acquire(blocking=False):
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                          f"Trop d'abonnés ({WATCH_THREAD_LIMIT} au plus sur ce serveur) ; "
+                          "utiliser aio_server.py pour de nombreux abonnés.")
+        try:
+            subscription = AVAILABILITY_HUB.subscribe(request.book_ids)
+            # Réveille le thread en attente dès que le client se déconnecte.
+            context.add_callback(subscription.close)
+            try:
+                while context.is_active() and not subscription.closed:
+                    resync, updates = subscription.wait()
+                    if resync:
+                        yield library_pb2.AvailabilityUpdate(resync=True)
+                    for book_id, available, delta in updates:
+                        yield library_pb2.AvailabilityUpdate(
+                            book_id=book_id, available_copies=available, delta=delta
+                        )
+            finally:
+                AVAILABILITY_HUB.unsubscribe(subscription)
+        finally:
+            _watch_slots.release()
+
 # ----------------------------------------------------
-# 4. Server Initialization
+# 6. Server Initialization
 # ----------------------------------------------------
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+# Threads du serveur à pool de threads (serve()) ; voir aussi WATCH_THREAD_LIMIT.
+SERVER_WORKERS = int(os.environ.get('LIBRARY_SERVER_WORKERS', '10'))
+# Délai (s) laissé aux appels en cours sur SIGTERM / SIGINT avant l'arrêt.
+SHUTDOWN_GRACE = 5
+
+# Autorise les pings keepalive des canaux longue durée du client Django
+# (sinon le serveur ferme la connexion avec GOAWAY « too_many_pings »).
+SERVER_OPTIONS = [
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.min_ping_interval_without_data_ms', 20000),
+    ('grpc.http2.max_ping_strikes', 0),
+]
+
+
+# Intervalle (s) de reconstruction de l'index ; 0 = uniquement au démarrage.
+SEARCH_INDEX_REFRESH_SECONDS = int(os.environ.get('LIBRARY_SEARCH_INDEX_REFRESH', '0'))
+
+# Port HTTP local des métriques Prometheus (/metrics) ; 0 = pas d'instrumentation.
+METRICS_PORT = int(os.environ.get('LIBRARY_METRICS_PORT', '0'))
+
+# Comptage des requêtes SQL par appel (trailing metadata x-query-count / x-query-time-ms).
+QUERY_STATS = os.environ.get('LIBRARY_QUERY_STATS', '') not in ('', '0')
+
+
+def enable_metrics(port):
+    """Démarre l'exporteur /metrics et y ajoute l'état du cache, de l'index et des abonnés."""
+    METRICS.register_stats('library_book_cache', "GetBook cache counters (BookCache.stats()).", BOOK_CACHE.stats)
+    METRICS.register_stats('library_search_index', "Books in the in-process search index.",
+                           lambda: {'books': len(SEARCH_INDEX)})
+    METRICS.register_stats('library_watch', "WatchAvailability hub counters.", AVAILABILITY_HUB.stats)
+    start_metrics_server(port)
+    print(f"Métriques Prometheus sur http://127.0.0.1:{port}/metrics")
+
+
+def serve(address='[::]:50051', reuse_port=False, metrics_port=METRICS_PORT):
+    options = list(SERVER_OPTIONS)
+    if reuse_port:
+        # Plusieurs processus partagent le port ; le noyau répartit les connexions.
+        options.append(('grpc.so_reuseport', 1))
+    interceptors = []
+    if metrics_port:
+        enable_metrics(metrics_port)
+        interceptors.append(MetricsInterceptor())
+    interceptors.append(AuthInterceptor())
+    if QUERY_STATS:
+        enable_query_stats()
+        interceptors.append(QueryStatsInterceptor())
+    # En dernier : au plus près du servicer, le délai est relu quand l'appel démarre vraiment.
+    enable_statement_deadlines()
+    interceptors.append(DeadlineInterceptor())
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=SERVER_WORKERS), options=options,
+                         interceptors=interceptors)
     servicer_instance = LibraryServicer()
     library_pb2_grpc.add_LibraryServiceServicer_to_server(servicer_instance, server)
-    server.add_insecure_port('[::]:50051') 
+    server.add_insecure_port(address)
+    SEARCH_INDEX.ensure_built(_search_index_rows)
+    print(f"Index de recherche prêt ({len(SEARCH_INDEX)} livres).")
+    if SEARCH_INDEX_REFRESH_SECONDS > 0:
+        start_search_index_refresher(SEARCH_INDEX_REFRESH_SECONDS)
+    if IDEMPOTENCY_PURGE_SECONDS > 0:
+        start_idempotency_purger(IDEMPOTENCY_PURGE_SECONDS)
+    start_hash_pool()
     server.start()
-    print("✅ SERVEUR gRPC DÉMARRÉ SUR LE PORT 50051")
-    server.wait_for_termination()
-if __name__ == '__main__':
-    try:
-        serve()
-    except KeyboardInterrupt:
+    print(f"✅ SERVEUR gRPC DÉMARRÉ SUR {address} (pid {os.getpid()})")
+
+    # SIGTERM (prefork.py, systemd, docker stop) comme Ctrl-C : arrêt propre,
+    # sinon les processus de hachage survivraient au serveur.
+    def stop(signum, frame):
         print("\n🛑 Arrêt du serveur...")
-        sys.exit(0)
\ No newline at end of file
+        server.stop(grace=SHUTDOWN_GRACE)
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+    try:
+        server.wait_for_termination()
+    finally:
+        stop_hash_pool()
+if __name__ == '__main__':
+    serve()
+    print(f"Cache GetBook : {BOOK_CACHE.stats()}")
@@ -0,0 +1,36 @@
+"""
+Helpers shared by the server interceptors (metrics, auth, query_stats,
+deadlines), for the thread-pool server and grpc.aio alike.
+
+An interceptor that wraps a call takes the servicer's behavior from the
+handler returned by `continuation` (inner_behavior), wraps it, and
+returns a handler of the same RPC type with the same (de)serializers
+(rebuild_handler).
+"""
+
+import grpc
+
+
+def method_name(handler_call_details):
+    """Nom court de la RPC (« BorrowBook ») à partir de « /library.LibraryService/BorrowBook »."""
+    return handler_call_details.method.rsplit('/', 1)[-1]
+
+
+def inner_behavior(handler):
+    """Fonction du servicer portée par le handler, quel que soit le type de RPC."""
+    return (handler.unary_unary or handler.unary_stream
+            or handler.stream_unary or handler.stream_stream)
+
+
+def rebuild_handler(handler, behavior):
+    """Handler du même type que `handler`, avec les mêmes (dé)sérialiseurs, qui appelle `behavior`."""
+    if handler.request_streaming and handler.response_streaming:
+        factory = grpc.stream_stream_rpc_method_handler
+    elif handler.request_streaming:
+        factory = grpc.stream_unary_rpc_method_handler
+    elif handler.response_streaming:
+        factory = grpc.unary_stream_rpc_method_handler
+    else:
+        factory = grpc.unary_unary_rpc_method_handler
+    return factory(behavior, request_deserializer=handler.request_deserializer,
+                   response_serializer=handler.response_serializer)
@@ -0,0 +1,131 @@
+"""
+Benchmark de contention sur un seul livre très demandé.
+
+    python manage.py bench_borrow_contention --threads 16 --duration 5
+
+Chaque thread enchaîne emprunt + retour du même livre avec son propre
+membre. La commande compare l'ancienne implémentation (SELECT ... FOR
+UPDATE puis save() complet, retour en lecture-modification-écriture) aux
+RPC BorrowBook/ReturnBook actuelles (UPDATE conditionnels), et vérifie que
+le stock final est cohérent. À lancer sur MySQL : SQLite verrouille toute
+la base et ne montre pas de différence significative.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from library_admin.models import Book, Loan, Member
+
+BENCH_ISBN = '0000000000000'
+
+
+def legacy_borrow(book_id, member_id):
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(id=book_id)
+        if book.available_copies <= 0:
+            return False
+        member = Member.objects.get(id=member_id)
+        Loan.objects.create(book=book, member=member, due_date=timezone.now().date() + timedelta(days=14))
+        book.available_copies -= 1
+        book.save()
+        return True
+
+
+def legacy_return(book_id, member_id):
+    with transaction.atomic():
+        loan = Loan.objects.filter(book_id=book_id, member_id=member_id, returned_date__isnull=True).first()
+        if not loan:
+            return False
+        loan.returned_date = timezone.now().date()
+        loan.save()
+        book = loan.book
+        book.available_copies += 1
+        book.save()
+        return True
+
+
+class Command(BaseCommand):
+    help = "Compare le débit emprunt/retour sur un livre unique (ancien verrouillage vs UPDATE conditionnels)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=5.0, help="secondes par variante")
+        parser.add_argument('--copies', type=int, default=8, help="exemplaires du livre testé")
+
+    def handle(self, *args, **options):
+        import library_pb2
+        from grpc_handler import LibraryServicer
+
+        servicer = LibraryServicer()
+
+        def current_borrow(book_id, member_id):
+            request = library_pb2.BorrowRequest(member_id=str(member_id), book_id=book_id)
+            return servicer.BorrowBook(request, None).success
+
+        def current_return(book_id, member_id):
+            request = library_pb2.BorrowRequest(member_id=str(member_id), book_id=book_id)
+            return servicer.ReturnBook(request, None).success
+
+        variants = (
+            ('select_for_update', legacy_borrow, legacy_return),
+            ('conditional_update', current_borrow, current_return),
+        )
+        for name, borrow, give_back in variants:
+            book, members = self._setup(options['threads'], options['copies'])
+            try:
+                cycles, errors, elapsed = self._run(book.id, members, borrow, give_back, options['duration'])
+                book.refresh_from_db()
+                active = Loan.objects.filter(book=book, returned_date__isnull=True).count()
+                drift = (book.total_copies - book.available_copies) - active
+                self.stdout.write(
+                    f"{name:>20}: {cycles / elapsed:9.1f} emprunts+retours/s "
+                    f"({cycles} cycles, {errors} erreurs, écart de stock {drift})"
+                )
+            finally:
+                self._teardown(book, members)
+
+    def _setup(self, threads, copies):
+        Book.objects.filter(isbn=BENCH_ISBN).delete()
+        book = Book.objects.create(title="Bench", author="Bench", isbn=BENCH_ISBN,
+                                   total_copies=copies, available_copies=copies)
+        members = [Member.objects.create(full_name=f"Bench {i}", email=f"bench{i}@bench.invalid")
+                   for i in range(threads)]
+        return book, members
+
+    def _teardown(self, book, members):
+        book.delete()
+        Member.objects.filter(id__in=[m.id for m in members]).delete()
+
+    def _run(self, book_id, members, borrow, give_back, duration):
+        counts = [0] * len(members)
+        errors = [0] * len(members)
+        start = threading.Barrier(len(members) + 1)
+        deadline = [0.0]
+
+        def worker(slot, member_id):
+            start.wait()
+            try:
+                while time.monotonic() < deadline[0]:
+                    try:
+                        if borrow(book_id, member_id):
+                            give_back(book_id, member_id)
+                            counts[slot] += 1
+                    except Exception:
+                        errors[slot] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(slot, m.id)) for slot, m in enumerate(members)]
+        for thread in threads:
+            thread.start()
+        deadline[0] = time.monotonic() + duration
+        began = time.monotonic()
+        start.wait()
+        for thread in threads:
+            thread.join()
+        return sum(counts), sum(errors), time.monotonic() - began
@@ -0,0 +1,149 @@
+"""
+CPU consommé par des appels que le client a déjà abandonnés.
+
+    python manage.py bench_cancellation --rows 300000 --calls 40 --timeout 0.05
+
+Démarre un serveur gRPC local et lui envoie `--calls` GetLibraryStats (trois
+agrégats qui parcourent tout le catalogue) avec un délai plus court que
+l'appel : le client abandonne pendant que le serveur calcule encore. Le
+servicer est instrumenté pour mesurer le temps CPU de chaque appel
+(time.thread_time) et savoir si le client était encore là à la fin.
+Deux variantes :
+
+- « ignoré » : sans DeadlineInterceptor, comme avant la propagation des
+  délais : chaque appel va au bout de ses requêtes ;
+- « propagé » : DeadlineInterceptor et limite de durée des requêtes SQL.
+
+Les appels annulés pendant qu'ils attendent un thread ne sont pas mesurés
+ici : gRPC (pool de threads comme asyncio) ne lance déjà pas leur handler.
+"""
+
+import threading
+import time
+from concurrent import futures
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from library_admin.models import Book
+
+SEED_ISBN_PREFIX = 'C'
+SEED_BATCH = 10000
+VARIANTS = ('ignoré', 'propagé')
+
+
+def _measured_servicer():
+    from grpc_handler import LibraryServicer
+
+    class MeasuredServicer(LibraryServicer):
+        def __init__(self):
+            super().__init__()
+            self.lock = threading.Lock()
+            self.handled = 0
+            self.cpu_useful = 0.0
+            self.cpu_wasted = 0.0
+
+        def GetLibraryStats(self, request, context):
+            started, answered = time.thread_time(), False
+            try:
+                response = super().GetLibraryStats(request, context)
+                answered = context.is_active()
+                return response
+            finally:
+                spent = time.thread_time() - started
+                # Réponse absente ou prête après le départ du client (annulation ou délai) : CPU perdu.
+                with self.lock:
+                    self.handled += 1
+                    if answered:
+                        self.cpu_useful += spent
+                    else:
+                        self.cpu_wasted += spent
+
+    return MeasuredServicer()
+
+
+class Command(BaseCommand):
+    help = "Mesure le CPU serveur gaspillé sur des appels expirés, sans et avec propagation des délais."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=300000, help="livres insérés avant la mesure")
+        parser.add_argument('--calls', type=int, default=40, help="appels par variante")
+        parser.add_argument('--timeout', type=float, default=0.05, help="délai client de chaque appel (s)")
+        parser.add_argument('--workers', type=int, default=4, help="threads du serveur et appels simultanés")
+        parser.add_argument('--keep', action='store_true', help="conserve les livres insérés")
+
+    def handle(self, *args, **options):
+        self._seed(options['rows'])
+        try:
+            for variant in VARIANTS:
+                result = self._run(variant, options)
+                per_call = (result['useful'] + result['wasted']) / max(1, result['handled'])
+                self.stdout.write(
+                    f"{variant:>8}: {result['ok']} réussis, {result['expired']} expirés côté client, "
+                    f"{result['handled']}/{options['calls']} exécutés ; CPU utile {result['useful']:.2f}s, "
+                    f"gaspillé {result['wasted']:.2f}s ({per_call * 1000:.0f} ms par appel exécuté)"
+                )
+        finally:
+            if not options['keep']:
+                Book.objects.filter(isbn__startswith=SEED_ISBN_PREFIX).delete()
+
+    def _run(self, variant, options):
+        import grpc
+        import library_pb2
+        import library_pb2_grpc
+        from deadlines import DeadlineInterceptor, enable_statement_deadlines
+        from grpc_handler import SERVER_OPTIONS
+
+        interceptors = []
+        if variant == 'propagé':
+            enable_statement_deadlines()
+            interceptors.append(DeadlineInterceptor())
+        servicer = _measured_servicer()
+        executor = futures.ThreadPoolExecutor(max_workers=options['workers'])
+        server = grpc.server(executor, options=SERVER_OPTIONS, interceptors=interceptors)
+        library_pb2_grpc.add_LibraryServiceServicer_to_server(servicer, server)
+        port = server.add_insecure_port('127.0.0.1:0')
+        server.start()
+        channel = grpc.insecure_channel(f'127.0.0.1:{port}')
+        stub = library_pb2_grpc.LibraryServiceStub(channel)
+        outcomes = {'ok': 0, 'expired': 0}
+        lock = threading.Lock()
+        remaining = iter(range(options['calls']))
+
+        def caller():
+            # Au plus `workers` appels en vol : le délai expire pendant le calcul, pas dans la file.
+            for _ in remaining:
+                try:
+                    stub.GetLibraryStats(library_pb2.StatsRequest(), timeout=options['timeout'])
+                    outcome = 'ok'
+                except grpc.RpcError:
+                    outcome = 'expired'
+                with lock:
+                    outcomes[outcome] += 1
+
+        try:
+            threads = [threading.Thread(target=caller) for _ in range(options['workers'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            channel.close()
+            # Laisse le serveur finir les appels en cours avant de compter.
+            server.stop(grace=60).wait()
+            executor.shutdown(wait=True)
+        return {
+            'ok': outcomes['ok'], 'expired': outcomes['expired'], 'handled': servicer.handled,
+            'useful': servicer.cpu_useful, 'wasted': servicer.cpu_wasted,
+        }
+
+    def _seed(self, rows):
+        Book.objects.filter(isbn__startswith=SEED_ISBN_PREFIX).delete()
+        self.stdout.write(f"Insertion de {rows} livres...")
+        for start in range(0, rows, SEED_BATCH):
+            with transaction.atomic():
+                Book.objects.bulk_create(
+                    Book(title=f"Cancel title {i:09d}", author=f"Cancel author {i % 1000}",
+                         isbn=f"{SEED_ISBN_PREFIX}{i:012d}", total_copies=1, available_copies=1)
+                    for i in range(start, min(rows, start + SEED_BATCH))
+                )
@@ -0,0 +1,93 @@
+"""
+Débit des flux ligne par ligne face aux flux par lots (*Batched).
+
+    python manage.py bench_stream_batching --rows 200000 --batch-sizes 10,100,500,1000
+
+Démarre un serveur gRPC local sur un port libre avec le servicer actuel,
+puis lit tout le catalogue via SearchBooks (un message par livre) et via
+SearchBooksBatched pour chaque taille de lot. Le client désérialise
+chaque livre, comme LibraryClient. La même lecture SQL (lots keyset) sert
+aux deux RPC : l'écart mesure le coût par message (trame HTTP/2,
+sérialisation, générateur Python).
+"""
+
+import time
+from concurrent import futures
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from library_admin.models import Book
+
+SEED_ISBN_PREFIX = 'R'
+SEED_BATCH = 10000
+
+
+class Command(BaseCommand):
+    help = "Compare le débit (livres/s) de SearchBooks et SearchBooksBatched sur un serveur local."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="livres insérés avant la mesure")
+        parser.add_argument('--batch-sizes', default='10,100,500,1000')
+        parser.add_argument('--repeat', type=int, default=3, help="lectures par variante (meilleur temps retenu)")
+        parser.add_argument('--keep', action='store_true', help="conserve les livres insérés")
+
+    def handle(self, *args, **options):
+        import grpc
+        import library_pb2
+        import library_pb2_grpc
+        from grpc_handler import SERVER_OPTIONS, LibraryServicer
+
+        self._seed(options['rows'])
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), options=SERVER_OPTIONS)
+        library_pb2_grpc.add_LibraryServiceServicer_to_server(LibraryServicer(), server)
+        port = server.add_insecure_port('127.0.0.1:0')
+        server.start()
+        channel = grpc.insecure_channel(f'127.0.0.1:{port}', options=[('grpc.max_receive_message_length', -1)])
+        stub = library_pb2_grpc.LibraryServiceStub(channel)
+        try:
+            def per_row():
+                return sum(1 for _ in stub.SearchBooks(library_pb2.SearchRequest()))
+
+            def batched(size):
+                def read():
+                    request = library_pb2.SearchRequest(batch_size=size)
+                    return sum(1 for batch in stub.SearchBooksBatched(request) for _ in batch.books)
+                return read
+
+            variants = [('SearchBooks', per_row)]
+            for size in (int(s) for s in options['batch_sizes'].split(',') if s.strip()):
+                variants.append((f'Batched({size})', batched(size)))
+            baseline = None
+            for name, read in variants:
+                count, elapsed = self._best_of(read, options['repeat'])
+                rate = count / elapsed
+                baseline = baseline or rate
+                self.stdout.write(f"{name:>16}: {count} livres en {elapsed:.2f}s "
+                                  f"({rate:,.0f} livres/s, x{rate / baseline:.1f})")
+        finally:
+            channel.close()
+            server.stop(None)
+            if not options['keep']:
+                Book.objects.filter(isbn__startswith=SEED_ISBN_PREFIX).delete()
+
+    def _best_of(self, read, repeat):
+        best = None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            count = read()
+            elapsed = time.perf_counter() - started
+            if best is None or elapsed < best[1]:
+                best = (count, elapsed)
+        return best
+
+    def _seed(self, rows):
+        Book.objects.filter(isbn__startswith=SEED_ISBN_PREFIX).delete()
+        self.stdout.write(f"Insertion de {rows} livres...")
+        for start in range(0, rows, SEED_BATCH):
+            with transaction.atomic():
+                Book.objects.bulk_create(
+                    Book(title=f"Batch title {i:09d}", author=f"Batch author {i % 1000}",
+                         isbn=f"{SEED_ISBN_PREFIX}{i:012d}", total_copies=3, available_copies=3)
+                    for i in range(start, min(rows, start + SEED_BATCH))
+                )
@@ -0,0 +1,158 @@
+"""
+Mémoire et débit des RPC de flux sur un grand volume.
+
+    python manage.py bench_stream_memory --rows 500000 --rpc members
+
+Compare l'ancienne implémentation (itération d'un queryset : tout le
+résultat est chargé en instances de modèle avant le premier message) au
+flux actuel du servicer (lots keyset en values_list). Chaque variante
+tourne dans un processus séparé pour que le pic de RSS mesuré
+(ru_maxrss) soit le sien ; chaque message est sérialisé comme il le
+serait avant l'envoi.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from library_admin.models import Book, Member
+
+SEED_EMAIL_DOMAIN = '@stream-bench.invalid'
+SEED_ISBN_PREFIX = 'B'
+SEED_BATCH = 10000
+VARIANTS = ('queryset', 'keyset')
+
+
+class _Context:
+    """Contexte minimal pour appeler le servicer hors serveur gRPC."""
+
+    def set_trailing_metadata(self, metadata):
+        pass
+
+    def is_active(self):
+        return True
+
+    def abort(self, code, details):
+        raise CommandError(f"{code}: {details}")
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en kilo-octets ailleurs.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def legacy_members():
+    import library_pb2
+    for m in Member.objects.all().order_by('-id'):
+        yield library_pb2.Member(
+            id=str(m.id), full_name=m.full_name, email=m.email, phone=m.phone or "",
+            date_joined=m.date_joined.isoformat() if m.date_joined else ""
+        )
+
+
+def legacy_books():
+    import library_pb2
+    for book in Book.objects.order_by('title', 'id'):
+        yield library_pb2.Book(
+            id=book.id, title=book.title, author=book.author, isbn=book.isbn,
+            total_copies=book.total_copies, available_copies=book.available_copies,
+            image_url=str(book.image) if book.image else ""
+        )
+
+
+class Command(BaseCommand):
+    help = "Mesure le pic de RSS et le débit de GetAllMembers/SearchBooks (queryset complet vs lots keyset)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help="lignes insérées avant la mesure")
+        parser.add_argument('--rpc', choices=('members', 'books'), default='members')
+        parser.add_argument('--keep', action='store_true', help="conserve les données insérées")
+        parser.add_argument('--variant', choices=VARIANTS, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['variant']:
+            self._measure(options['rpc'], options['variant'])
+            return
+        self._seed(options['rpc'], options['rows'])
+        try:
+            for variant in VARIANTS:
+                result = self._spawn(options['rpc'], variant)
+                self.stdout.write(
+                    f"{variant:>9}: {result['messages']} messages en {result['seconds']:.2f}s "
+                    f"({result['messages'] / max(result['seconds'], 1e-9):,.0f}/s), "
+                    f"pic RSS +{result['rss_kb'] / 1024:.1f} Mo"
+                )
+        finally:
+            if not options['keep']:
+                self._cleanup(options['rpc'])
+
+    # --- Processus de mesure ---
+    def _spawn(self, rpc, variant):
+        manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+        completed = subprocess.run(
+            [sys.executable, manage_py, 'bench_stream_memory', '--rpc', rpc, '--variant', variant],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if completed.returncode != 0:
+            raise CommandError(f"La variante {variant} a échoué :\n{completed.stderr}")
+        # Le dernier objet JSON de la sortie est le résultat (grpc_handler affiche aussi des messages).
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def _measure(self, rpc, variant):
+        import library_pb2
+        from grpc_handler import LibraryServicer
+
+        if variant == 'queryset':
+            messages = legacy_members() if rpc == 'members' else legacy_books()
+        else:
+            servicer = LibraryServicer()
+            request = library_pb2.SearchRequest()
+            if rpc == 'members':
+                messages = servicer.GetAllMembers(request, _Context())
+            else:
+                messages = servicer.SearchBooks(request, _Context())
+        baseline = _peak_rss_kb()
+        started = time.perf_counter()
+        count = 0
+        for message in messages:
+            message.SerializeToString()
+            count += 1
+        elapsed = time.perf_counter() - started
+        self.stdout.write(json.dumps({
+            'messages': count, 'seconds': elapsed, 'rss_kb': _peak_rss_kb() - baseline,
+        }))
+
+    # --- Jeu de données ---
+    def _seed(self, rpc, rows):
+        self._cleanup(rpc)
+        self.stdout.write(f"Insertion de {rows} lignes ({rpc})...")
+        for start in range(0, rows, SEED_BATCH):
+            count = min(SEED_BATCH, rows - start)
+            with transaction.atomic():
+                if rpc == 'members':
+                    Member.objects.bulk_create(
+                        Member(full_name=f"Stream member {i}", email=f"s{i}{SEED_EMAIL_DOMAIN}",
+                               member_id=f"STREAM-{i:09d}", phone="0600000000")
+                        for i in range(start, start + count)
+                    )
+                else:
+                    Book.objects.bulk_create(
+                        Book(title=f"Stream title {i:09d}", author=f"Stream author {i % 1000}",
+                             isbn=f"{SEED_ISBN_PREFIX}{i:012d}", total_copies=3, available_copies=3)
+                        for i in range(start, start + count)
+                    )
+
+    def _cleanup(self, rpc):
+        if rpc == 'members':
+            Member.objects.filter(email__endswith=SEED_EMAIL_DOMAIN).delete()
+        else:
+            Book.objects.filter(isbn__startswith=SEED_ISBN_PREFIX).delete()
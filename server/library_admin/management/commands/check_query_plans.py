@@ -0,0 +1,247 @@
+"""
+Vérifie par EXPLAIN que les requêtes des RPC passent par un index (MySQL).
+
+    python manage.py check_query_plans --seed-loans 1000000
+
+Les requêtes vérifiées ne sont pas recopiées ici : chaque scénario appelle
+le servicer de grpc_handler.py (pages de SearchBooks, flux keyset, prêts,
+statistiques...) dans une transaction annulée à la fin, et toutes les
+requêtes qu'il exécute réellement sont relues avec EXPLAIN FORMAT=JSON. Un
+changement de _iter_keyset, de _book_rows ou des filtres de prêts est donc
+vérifié sans modifier cette commande. Avec --seed-loans, un jeu de données
+réaliste est d'abord inséré (les plans d'un optimiseur dépendent du volume).
+La commande échoue si un plan contient un parcours complet de table
+(« access_type: ALL »), hors EXPECTED_SCANS.
+
+Seuls les plans MySQL, la base de production, sont vérifiés : sous SQLite
+ou PostgreSQL la commande s'arrête en erreur au lieu de réussir à tort.
+"""
+
+import json
+import random
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from library_admin.models import Book, Loan, Member
+
+SEED_ISBN_PREFIX = 'S'
+SEED_EMAIL_DOMAIN = '@seed.invalid'
+SEED_BATCH = 10000
+PAGE = 50
+
+# Parcours complets voulus : les totaux du tableau de bord portent sur tout le catalogue.
+EXPECTED_SCANS = {
+    "GetLibraryStats": {Book._meta.db_table},
+}
+_EXPLAINABLE = re.compile(r'\s*(SELECT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+class _PlanContext:
+    """ServicerContext minimal pour appeler le servicer hors d'un serveur gRPC."""
+
+    def __init__(self):
+        self.trailing = ()
+
+    def is_active(self):
+        return True
+
+    def time_remaining(self):
+        return None
+
+    def set_trailing_metadata(self, trailing_metadata):
+        self.trailing = tuple(trailing_metadata)
+
+    def set_code(self, code):
+        pass
+
+    def set_details(self, details):
+        pass
+
+    def add_callback(self, callback):
+        return True
+
+    def abort(self, code, details=''):
+        raise CommandError(f"Appel refusé ({code.name}) : {details}")
+
+    def next_page_token(self):
+        from grpc_handler import NEXT_PAGE_TOKEN_KEY
+        return dict(self.trailing).get(NEXT_PAGE_TOKEN_KEY, '')
+
+
+class Command(BaseCommand):
+    help = "Échoue si une requête d'un RPC déclenche un parcours complet de table (MySQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-loans', type=int, default=0,
+                            help="insère d'abord ce nombre de prêts (avec livres et membres associés)")
+        parser.add_argument('--seed-books', type=int, default=50000)
+        parser.add_argument('--seed-members', type=int, default=10000)
+        parser.add_argument('--cleanup', action='store_true', help="supprime les données de test à la fin")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError(f"Plans vérifiés sous MySQL uniquement (base configurée : {connection.vendor}).")
+        if options['seed_loans']:
+            self._seed(options['seed_loans'], options['seed_books'], options['seed_members'])
+        try:
+            failures = []
+            for name, run in self._scenarios():
+                statements = self._capture(run)
+                expected = EXPECTED_SCANS.get(name, set())
+                scanned = []
+                for sql, plan in statements:
+                    scans = sorted(set(self._full_scans(json.loads(plan))) - expected)
+                    if scans:
+                        scanned.append((sql, scans))
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"    {sql}\n    {plan}")
+                if scanned:
+                    failures.append(name)
+                    for sql, scans in scanned:
+                        self.stdout.write(self.style.ERROR(
+                            f"✗ {name}: parcours complet de {', '.join(scans)}\n    {sql[:300]}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"✓ {name} ({len(statements)} requête(s))"))
+        finally:
+            if options['cleanup']:
+                self._cleanup()
+        if failures:
+            raise CommandError(f"{len(failures)} RPC avec une requête sans index : {', '.join(failures)}")
+
+    # --- Scénarios : appels réels du servicer (cf. grpc_handler.py) ---
+    def _scenarios(self):
+        import library_pb2
+        from grpc_handler import BOOK_CACHE, SEARCH_INDEX, STREAM_CHUNK_SIZE, LibraryServicer, _search_index_rows
+
+        servicer = LibraryServicer()
+        book = Book.objects.order_by('id').values_list('id', 'title', 'isbn').first()
+        loan = Loan.objects.filter(returned_date__isnull=True).values_list('book_id', 'member_id').first()
+        member_id = Member.objects.order_by('-id').values_list('id', flat=True).first()
+        if book is None or loan is None or member_id is None:
+            raise CommandError("Base vide : relancez avec --seed-loans pour générer des données.")
+        book_id, title, isbn = book
+        # Construit une fois au démarrage du serveur, en lisant tout le catalogue : hors vérification.
+        SEARCH_INDEX.ensure_built(_search_index_rows)
+
+        def pages(method, request):
+            # Première page, puis la suivante avec le curseur renvoyé.
+            context = _PlanContext()
+            list(method(request, context))
+            request.page_token = context.next_page_token()
+            if request.page_token:
+                list(method(request, _PlanContext()))
+
+        def stream(method, request):
+            # Assez de lignes pour lire le deuxième lot keyset, puis le client « part ».
+            responses = method(request, _PlanContext())
+            for _ in zip(range(STREAM_CHUNK_SIZE + 1), responses):
+                pass
+            responses.close()
+
+        def get_book():
+            BOOK_CACHE.invalidate(book_id)
+            servicer.GetBook(library_pb2.SearchRequest(query=str(book_id)), _PlanContext())
+
+        search = library_pb2.SearchRequest
+        borrow = library_pb2.BorrowRequest(book_id=loan[0], member_id=str(loan[1]), request_id='plan-check')
+        return [
+            ("SearchBooks (catalogue, pages)", lambda: pages(servicer.SearchBooks, search(page_size=PAGE))),
+            ("SearchBooks (catalogue, flux)", lambda: stream(servicer.SearchBooks, search())),
+            ("SearchBooks (recherche)", lambda: pages(servicer.SearchBooks, search(query=title, page_size=PAGE))),
+            ("GetBook", get_book),
+            ("GetBooks", lambda: servicer.GetBooks(library_pb2.IdListRequest(ids=[book_id, loan[0]]), _PlanContext())),
+            ("CreateBooks (ISBN existants)", lambda: servicer.CreateBooks(
+                iter([library_pb2.Book(title=title, isbn=isbn)]), _PlanContext())),
+            ("UpdateBookAvailability", lambda: servicer.UpdateBookAvailability(
+                library_pb2.Book(id=book_id, title=title, update_mask={'paths': ['title']}), _PlanContext())),
+            ("GetAllMembers (pages)", lambda: pages(servicer.GetAllMembers, search(page_size=PAGE))),
+            ("GetAllMembers (flux)", lambda: stream(servicer.GetAllMembers, search())),
+            ("GetAllMembers (emprunteurs d'un livre)", lambda: pages(
+                servicer.GetAllMembers, search(page_size=PAGE, borrowing_book_id=loan[0]))),
+            ("GetMemberDetail", lambda: servicer.GetMemberDetail(
+                library_pb2.UserIdRequest(user_id=str(member_id)), _PlanContext())),
+            ("BorrowBook", lambda: servicer.BorrowBook(borrow, _PlanContext())),
+            ("ReturnBook", lambda: servicer.ReturnBook(borrow, _PlanContext())),
+            ("GetLibraryStats", lambda: servicer.GetLibraryStats(library_pb2.StatsRequest(), _PlanContext())),
+        ]
+
+    def _capture(self, run):
+        """(sql, plan JSON) de chaque requête du scénario ; ses écritures sont annulées."""
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            if not many and _EXPLAINABLE.match(sql):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with transaction.atomic():
+            with connection.execute_wrapper(record):
+                run()
+            plans = [(sql, self._explain(sql, params)) for sql, params in statements]
+            transaction.set_rollback(True)
+        return plans
+
+    def _explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN FORMAT=JSON {sql}", params)
+            return cursor.fetchone()[0]
+
+    # --- Lecture des plans ---
+    def _full_scans(self, node):
+        """Tables lues en entier (« access_type: ALL ») dans un plan EXPLAIN FORMAT=JSON."""
+        if isinstance(node, dict):
+            if node.get('access_type') == 'ALL':
+                yield node.get('table_name', '?')
+            for value in node.values():
+                yield from self._full_scans(value)
+        elif isinstance(node, list):
+            for value in node:
+                yield from self._full_scans(value)
+
+    # --- Jeu de données ---
+    def _seed(self, loans, books, members):
+        self.stdout.write(f"Insertion de {books} livres, {members} membres et {loans} prêts...")
+        today = timezone.now().date()
+        with transaction.atomic():
+            Book.objects.bulk_create(
+                (Book(title=f"Seed title {i:07d}", author=f"Seed author {i % 5000}",
+                      isbn=f"{SEED_ISBN_PREFIX}{i:012d}", total_copies=5, available_copies=5)
+                 for i in range(books)),
+                batch_size=SEED_BATCH,
+            )
+            Member.objects.bulk_create(
+                (Member(full_name=f"Seed member {i}", email=f"seed{i}{SEED_EMAIL_DOMAIN}",
+                        member_id=f"SEED-{i:08d}")
+                 for i in range(members)),
+                batch_size=SEED_BATCH,
+            )
+        book_ids = list(Book.objects.filter(isbn__startswith=SEED_ISBN_PREFIX).values_list('id', flat=True))
+        member_ids = list(Member.objects.filter(email__endswith=SEED_EMAIL_DOMAIN).values_list('id', flat=True))
+        rng = random.Random(42)
+        for start in range(0, loans, SEED_BATCH):
+            batch = []
+            for _ in range(min(SEED_BATCH, loans - start)):
+                due = today - timedelta(days=rng.randint(-14, 720))
+                # ~5 % des prêts sont encore en cours, comme dans une bibliothèque réelle.
+                returned = None if rng.random() < 0.05 else due - timedelta(days=rng.randint(0, 14))
+                batch.append(Loan(book_id=rng.choice(book_ids), member_id=rng.choice(member_ids),
+                                  due_date=due, returned_date=returned))
+            with transaction.atomic():
+                Loan.objects.bulk_create(batch)
+        self._analyze()
+
+    def _analyze(self):
+        tables = [Book._meta.db_table, Loan._meta.db_table, Member._meta.db_table]
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE TABLE {', '.join(tables)}")
+            cursor.fetchall()
+
+    def _cleanup(self):
+        seeded_books = Book.objects.filter(isbn__startswith=SEED_ISBN_PREFIX)
+        Loan.objects.filter(book__in=seeded_books).delete()
+        seeded_books.delete()
+        Member.objects.filter(email__endswith=SEED_EMAIL_DOMAIN).delete()
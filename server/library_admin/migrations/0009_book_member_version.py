@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_admin', '0008_loan_and_book_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
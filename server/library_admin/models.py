@@ -11,6 +11,8 @@ class Member(models.Model):
     date_joined = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     max_loans = models.IntegerField(default=5, verbose_name="Nombre maximum de prêts")
+    # Incrémenté à chaque modification : UpdateMember compare la version attendue (verrou optimiste).
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def save(self, *args, **kwargs):
         # Si le member_id est vide (chaîne vide ou None)
@@ -30,6 +32,14 @@ class Book(models.Model):
     available_copies = models.IntegerField(default=1, 
                                            help_text="Number of copies currently available for loan.") # <-- SYNTAX FIX: Added closing parenthesis
     image = models.ImageField(upload_to='book_covers/', null=True, blank=True)
+    # Incrémenté à chaque édition de la fiche, pas par les emprunts et retours : verrou optimiste.
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            # Parcours du catalogue par curseur (SearchBooks sans requête) : ORDER BY title, id.
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.author} (Available: {self.available_copies}/{self.total_copies})"
@@ -54,6 +64,14 @@ class Loan(models.Model):
    due_date = models.DateField()
    returned_date = models.DateField(null=True, blank=True)
 
+   class Meta:
+        indexes = [
+            # ReturnBook : prêt actif d'un membre pour un livre (returned_date IS NULL).
+            models.Index(fields=['book', 'member', 'returned_date'], name='loan_book_member_open_idx'),
+            # GetLibraryStats : prêts actifs (returned_date IS NULL) et en retard (due_date < aujourd'hui).
+            models.Index(fields=['returned_date', 'due_date'], name='loan_open_due_idx'),
+        ]
+
    def save(self, *args, **kwargs):
         # Définit automatiquement une date de retour à +14 jours si non spécifiée
         if not self.due_date:
@@ -61,4 +79,20 @@ class Loan(models.Model):
         super().save(*args, **kwargs)
 
    def __str__(self):
-        return f"Loan: {self.book.title} -> {self.member.full_name}"
\ No newline at end of file
+        # N'utilise les objets liés que s'ils sont déjà chargés (select_related) :
+        # sinon chaque affichage d'un prêt déclencherait deux requêtes.
+        book = self.book.title if Loan.book.is_cached(self) else f"livre #{self.book_id}"
+        member = self.member.full_name if Loan.member.is_cached(self) and self.member else f"membre #{self.member_id}"
+        return f"Loan: {book} -> {member}"
+
+
+class IdempotencyKey(models.Model):
+    # Réponse d'une mutation déjà réussie (BorrowBook, ReturnBook, CreateBook),
+    # par request_id : une requête rejouée (retry, hedging) la reçoit telle quelle
+    # au lieu d'être réexécutée. Purgée après LIBRARY_IDEMPOTENCY_TTL secondes.
+    key = models.CharField(max_length=100, primary_key=True)  # "<RPC>:<request_id>"
+    response = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
@@ -22,35 +22,58 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+from google.protobuf import field_mask_pb2 as google_dot_protobuf_dot_field__mask__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rlibrary.proto\x12\x0elibrary_system\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"B\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"Z\n\x06Member\x12\n\n\x02id\x18\x01 \x01(\t\x12\x11\n\tfull_name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\r\n\x05phone\x18\x04 \x01(\t\x12\x13\n\x0b\x64\x61te_joined\x18\x05 \x01(\t\"\x82\x01\n\x04\x42ook\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05title\x18\x02 \x01(\t\x12\x0e\n\x06\x61uthor\x18\x03 \x01(\t\x12\x0c\n\x04isbn\x18\x04 \x01(\t\x12\x14\n\x0ctotal_copies\x18\x05 \x01(\x05\x12\x18\n\x10\x61vailable_copies\x18\x06 \x01(\x05\x12\x11\n\timage_url\x18\x07 \x01(\t\"\x1e\n\rSearchRequest\x12\r\n\x05query\x18\x01 \x01(\t\"E\n\x0eStatusResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\tentity_id\x18\x03 \x01(\x05\"3\n\rBorrowRequest\x12\x11\n\tmember_id\x18\x01 \x01(\t\x12\x0f\n\x07\x62ook_id\x18\x02 \x01(\x05\"\x81\x01\n\x14UpdateProfileRequest\x12\x10\n\x08staff_id\x18\x01 \x01(\t\x12\x14\n\x0cnew_username\x18\x02 \x01(\t\x12\x11\n\tnew_email\x18\x03 \x01(\t\x12\x18\n\x10\x63urrent_password\x18\x04 \x01(\t\x12\x14\n\x0cnew_password\x18\x05 \x01(\t\"\x8e\x01\n\nUserDetail\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08username\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x10\n\x08is_staff\x18\x04 \x01(\x08\x12\x11\n\tis_active\x18\x05 \x01(\x08\x12\x13\n\x0b\x64\x61te_joined\x18\x06 \x01(\t\x12\x14\n\x0cis_superuser\x18\x07 \x01(\x08\" \n\rUserIdRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t2\x8f\n\n\x0eLibraryService\x12H\n\tUserLogin\x12\x1c.library_system.LoginRequest\x1a\x1d.library_system.LoginResponse\x12\x46\n\x0c\x43reateMember\x12\x16.library_system.Member\x1a\x1e.library_system.StatusResponse\x12\x46\n\x0cUpdateMember\x12\x16.library_system.Member\x1a\x1e.library_system.StatusResponse\x12M\n\x0c\x44\x65leteMember\x12\x1d.library_system.UserIdRequest\x1a\x1e.library_system.StatusResponse\x12H\n\rGetAllMembers\x12\x1d.library_system.SearchRequest\x1a\x16.library_system.Member0\x01\x12H\n\x0fGetMemberDetail\x12\x1d.library_system.UserIdRequest\x1a\x16.library_system.Member\x12\x42\n\nCreateBook\x12\x14.library_system.Book\x1a\x1e.library_system.StatusResponse\x12\x44\n\x0bSearchBooks\x12\x1d.library_system.SearchRequest\x1a\x14.library_system.Book0\x01\x12>\n\x07GetBook\x12\x1d.library_system.SearchRequest\x1a\x14.library_system.Book\x12N\n\x16UpdateBookAvailability\x12\x14.library_system.Book\x1a\x1e.library_system.StatusResponse\x12K\n\nDeleteBook\x12\x1d.library_system.SearchRequest\x1a\x1e.library_system.StatusResponse\x12K\n\nBorrowBook\x12\x1d.library_system.BorrowRequest\x1a\x1e.library_system.StatusResponse\x12K\n\nReturnBook\x12\x1d.library_system.BorrowRequest\x1a\x1e.library_system.StatusResponse\x12J\n\x0bGetAllUsers\x12\x1d.library_system.SearchRequest\x1a\x1a.library_system.UserDetail0\x01\x12J\n\rGetUserDetail\x12\x1d.library_system.UserIdRequest\x1a\x1a.library_system.UserDetail\x12K\n\nDeleteUser\x12\x1d.library_system.UserIdRequest\x1a\x1e.library_system.StatusResponse\x12Z\n\x12UpdateStaffProfile\x12$.library_system.UpdateProfileRequest\x1a\x1e.library_system.StatusResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rlibrary.proto\x12\x0elibrary_system\x1a google/protobuf/field_mask.proto\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"m\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x15\n\rsession_token\x18\x04 \x01(\t\x12\x12\n\nexpires_at\x18\x05 \x01(\x03\"\xb2\x01\n\x06Member\x12\n\n\x02id\x18\x01 \x01(\t\x12\x11\n\tfull_name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\r\n\x05phone\x18\x04 \x01(\t\x12\x13\n\x0b\x64\x61te_joined\x18\x05 \x01(\t\x12/\n\x0bupdate_mask\x18\x06 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\x12\x0f\n\x07version\x18\x07 \x01(\x05\x12\x14\n\x0cnot_modified\x18\x08 \x01(\x08\"\xb4\x02\n\x04\x42ook\x12\n\n\x02id\x18\x01 \x01(\x05\x12\r\n\x05title\x18\x02 \x01(\t\x12\x0e\n\x06\x61uthor\x18\x03 \x01(\t\x12\x0c\n\x04isbn\x18\x04 \x01(\t\x12\x14\n\x0ctotal_copies\x18\x05 \x01(\x05\x12\x18\n\x10\x61vailable_copies\x18\x06 \x01(\x05\x12\x11\n\timage_url\x18\x07 \x01(\t\x12/\n\x0bupdate_mask\x18\x08 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\x12\x0f\n\x07version\x18\t \x01(\x05\x12\x14\n\x0cnot_modified\x18\n \x01(\x08\x12\x12\n\nrequest_id\x18\x0b \x01(\t\x12&\n\x19\x65xpected_available_copies\x18\x0c \x01(\x05H\x00\x88\x01\x01\x42\x1c\n\x1a_expected_available_copies\"\xf1\x01\n\rSearchRequest\x12\r\n\x05query\x18\x01 \x01(\t\x12\x11\n\tpage_size\x18\x02 \x01(\x05\x12\x12\n\npage_token\x18\x03 \x01(\t\x12\x12\n\nbatch_size\x18\x04 \x01(\x05\x12-\n\tread_mask\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\x12\x12\n\nif_version\x18\x06 \x01(\x05\x12 \n\x13if_available_copies\x18\x07 \x01(\x05H\x00\x88\x01\x01\x12\x19\n\x11\x62orrowing_book_id\x18\x08 \x01(\x05\x42\x16\n\x14_if_available_copies\"E\n\x0eStatusResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x11\n\tentity_id\x18\x03 \x01(\x05\"G\n\rBorrowRequest\x12\x11\n\tmember_id\x18\x01 \x01(\t\x12\x0f\n\x07\x62ook_id\x18\x02 \x01(\x05\x12\x12\n\nrequest_id\x18\x03 \x01(\t\"\x81\x01\n\x14UpdateProfileRequest\x12\x10\n\x08staff_id\x18\x01 \x01(\t\x12\x14\n\x0cnew_username\x18\x02 \x01(\t\x12\x11\n\tnew_email\x18\x03 \x01(\t\x12\x18\n\x10\x63urrent_password\x18\x04 \x01(\t\x12\x14\n\x0cnew_password\x18\x05 \x01(\t\"\x8e\x01\n\nUserDetail\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x10\n\x08username\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\x12\x10\n\x08is_staff\x18\x04 \x01(\x08\x12\x11\n\tis_active\x18\x05 \x01(\x08\x12\x13\n\x0b\x64\x61te_joined\x18\x06 \x01(\t\x12\x14\n\x0cis_superuser\x18\x07 \x01(\x08\"4\n\rUserIdRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\x12\n\nif_version\x18\x02 \x01(\x05\"<\n\x0c\x42ookRowError\x12\r\n\x05index\x18\x01 \x01(\x05\x12\x0c\n\x04isbn\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\"c\n\x12\x42ulkCreateResponse\x12\x0f\n\x07\x63reated\x18\x01 \x01(\x05\x12\x0e\n\x06\x66\x61iled\x18\x02 \x01(\x05\x12,\n\x06\x65rrors\x18\x03 \x03(\x0b\x32\x1c.library_system.BookRowError\"0\n\tBookBatch\x12#\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\x14.library_system.Book\"6\n\x0bMemberBatch\x12\'\n\x07members\x18\x01 \x03(\x0b\x32\x16.library_system.Member\"\x1c\n\rIdListRequest\x12\x0b\n\x03ids\x18\x01 \x03(\x05\"D\n\x08\x42ookList\x12#\n\x05\x62ooks\x18\x01 \x03(\x0b\x32\x14.library_system.Book\x12\x13\n\x0bmissing_ids\x18\x02 \x03(\x05\"J\n\nMemberList\x12\'\n\x07members\x18\x01 \x03(\x0b\x32\x16.library_system.Member\x12\x13\n\x0bmissing_ids\x18\x02 \x03(\x05\"\x0e\n\x0cStatsRequest\"\xb1\x01\n\x0cLibraryStats\x12\x14\n\x0ctotal_titles\x18\x01 \x01(\x05\x12\x14\n\x0ctotal_copies\x18\x02 \x01(\x05\x12\x18\n\x10\x61vailable_copies\x18\x03 \x01(\x05\x12\x17\n\x0f\x62orrowed_copies\x18\x04 \x01(\x05\x12\x14\n\x0c\x61\x63tive_loans\x18\x05 \x01(\x05\x12\x15\n\roverdue_loans\x18\x06 \x01(\x05\x12\x15\n\rtotal_members\x18\x07 \x01(\x05\" \n\x0cWatchRequest\x12\x10\n\x08\x62ook_ids\x18\x01 \x03(\x05\"^\n\x12\x41vailabilityUpdate\x12\x0f\n\x07\x62ook_id\x18\x01 \x01(\x05\x12\x18\n\x10\x61vailable_copies\x18\x02 \x01(\x05\x12\r\n\x05\x64\x65lta\x18\x03 \x01(\x05\x12\x0e\n\x06resync\x18\x04 \x01(\x08\x32\xb8\x0e\n\x0eLibraryService\x12H\n\tUserLogin\x12\x1c.library_system.LoginRequest\x1a\x1d.library_system.LoginResponse\x12\x46\n\x0c\x43reateMember\x12\x16.library_system.Member\x1a\x1e.library_system.StatusResponse\x12\x46\n\x0cUpdateMember\x12\x16.library_system.Member\x1a\x1e.library_system.StatusResponse\x12M\n\x0c\x44\x65leteMember\x12\x1d.library_system.UserIdRequest\x1a\x1e.library_system.StatusResponse\x12H\n\rGetAllMembers\x12\x1d.library_system.SearchRequest\x1a\x16.library_system.Member0\x01\x12T\n\x14GetAllMembersBatched\x12\x1d.library_system.SearchRequest\x1a\x1b.library_system.MemberBatch0\x01\x12H\n\x0fGetMemberDetail\x12\x1d.library_system.UserIdRequest\x1a\x16.library_system.Member\x12G\n\nGetMembers\x12\x1d.library_system.IdListRequest\x1a\x1a.library_system.MemberList\x12\x42\n\nCreateBook\x12\x14.library_system.Book\x1a\x1e.library_system.StatusResponse\x12I\n\x0b\x43reateBooks\x12\x14.library_system.Book\x1a\".library_system.BulkCreateResponse(\x01\x12\x44\n\x0bSearchBooks\x12\x1d.library_system.SearchRequest\x1a\x14.library_system.Book0\x01\x12P\n\x12SearchBooksBatched\x12\x1d.library_system.SearchRequest\x1a\x19.library_system.BookBatch0\x01\x12>\n\x07GetBook\x12\x1d.library_system.SearchRequest\x1a\x14.library_system.Book\x12\x43\n\x08GetBooks\x12\x1d.library_system.IdListRequest\x1a\x18.library_system.BookList\x12N\n\x16UpdateBookAvailability\x12\x14.library_system.Book\x1a\x1e.library_system.StatusResponse\x12K\n\nDeleteBook\x12\x1d.library_system.SearchRequest\x1a\x1e.library_system.StatusResponse\x12K\n\nBorrowBook\x12\x1d.library_system.BorrowRequest\x1a\x1e.library_system.StatusResponse\x12K\n\nReturnBook\x12\x1d.library_system.BorrowRequest\x1a\x1e.library_system.StatusResponse\x12J\n\x0bGetAllUsers\x12\x1d.library_system.SearchRequest\x1a\x1a.library_system.UserDetail0\x01\x12J\n\rGetUserDetail\x12\x1d.library_system.UserIdRequest\x1a\x1a.library_system.UserDetail\x12K\n\nDeleteUser\x12\x1d.library_system.UserIdRequest\x1a\x1e.library_system.StatusResponse\x12Z\n\x12UpdateStaffProfile\x12$.library_system.UpdateProfileRequest\x1a\x1e.library_system.StatusResponse\x12M\n\x0fGetLibraryStats\x12\x1c.library_system.StatsRequest\x1a\x1c.library_system.LibraryStats\x12W\n\x11WatchAvailability\x12\x1c.library_system.WatchRequest\x1a\".library_system.AvailabilityUpdate0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'library_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_LOGINREQUEST']._serialized_start=33
-  _globals['_LOGINREQUEST']._serialized_end=83
-  _globals['_LOGINRESPONSE']._serialized_start=85
-  _globals['_LOGINRESPONSE']._serialized_end=151
-  _globals['_MEMBER']._serialized_start=153
-  _globals['_MEMBER']._serialized_end=243
-  _globals['_BOOK']._serialized_start=246
-  _globals['_BOOK']._serialized_end=376
-  _globals['_SEARCHREQUEST']._serialized_start=378
-  _globals['_SEARCHREQUEST']._serialized_end=408
-  _globals['_STATUSRESPONSE']._serialized_start=410
-  _globals['_STATUSRESPONSE']._serialized_end=479
-  _globals['_BORROWREQUEST']._serialized_start=481
-  _globals['_BORROWREQUEST']._serialized_end=532
-  _globals['_UPDATEPROFILEREQUEST']._serialized_start=535
-  _globals['_UPDATEPROFILEREQUEST']._serialized_end=664
-  _globals['_USERDETAIL']._serialized_start=667
-  _globals['_USERDETAIL']._serialized_end=809
-  _globals['_USERIDREQUEST']._serialized_start=811
-  _globals['_USERIDREQUEST']._serialized_end=843
-  _globals['_LIBRARYSERVICE']._serialized_start=846
-  _globals['_LIBRARYSERVICE']._serialized_end=2141
+  _globals['_LOGINREQUEST']._serialized_start=67
+  _globals['_LOGINREQUEST']._serialized_end=117
+  _globals['_LOGINRESPONSE']._serialized_start=119
+  _globals['_LOGINRESPONSE']._serialized_end=228
+  _globals['_MEMBER']._serialized_start=231
+  _globals['_MEMBER']._serialized_end=409
+  _globals['_BOOK']._serialized_start=412
+  _globals['_BOOK']._serialized_end=720
+  _globals['_SEARCHREQUEST']._serialized_start=723
+  _globals['_SEARCHREQUEST']._serialized_end=964
+  _globals['_STATUSRESPONSE']._serialized_start=966
+  _globals['_STATUSRESPONSE']._serialized_end=1035
+  _globals['_BORROWREQUEST']._serialized_start=1037
+  _globals['_BORROWREQUEST']._serialized_end=1108
+  _globals['_UPDATEPROFILEREQUEST']._serialized_start=1111
+  _globals['_UPDATEPROFILEREQUEST']._serialized_end=1240
+  _globals['_USERDETAIL']._serialized_start=1243
+  _globals['_USERDETAIL']._serialized_end=1385
+  _globals['_USERIDREQUEST']._serialized_start=1387
+  _globals['_USERIDREQUEST']._serialized_end=1439
+  _globals['_BOOKROWERROR']._serialized_start=1441
+  _globals['_BOOKROWERROR']._serialized_end=1501
+  _globals['_BULKCREATERESPONSE']._serialized_start=1503
+  _globals['_BULKCREATERESPONSE']._serialized_end=1602
+  _globals['_BOOKBATCH']._serialized_start=1604
+  _globals['_BOOKBATCH']._serialized_end=1652
+  _globals['_MEMBERBATCH']._serialized_start=1654
+  _globals['_MEMBERBATCH']._serialized_end=1708
+  _globals['_IDLISTREQUEST']._serialized_start=1710
+  _globals['_IDLISTREQUEST']._serialized_end=1738
+  _globals['_BOOKLIST']._serialized_start=1740
+  _globals['_BOOKLIST']._serialized_end=1808
+  _globals['_MEMBERLIST']._serialized_start=1810
+  _globals['_MEMBERLIST']._serialized_end=1884
+  _globals['_STATSREQUEST']._serialized_start=1886
+  _globals['_STATSREQUEST']._serialized_end=1900
+  _globals['_LIBRARYSTATS']._serialized_start=1903
+  _globals['_LIBRARYSTATS']._serialized_end=2080
+  _globals['_WATCHREQUEST']._serialized_start=2082
+  _globals['_WATCHREQUEST']._serialized_end=2114
+  _globals['_AVAILABILITYUPDATE']._serialized_start=2116
+  _globals['_AVAILABILITYUPDATE']._serialized_end=2210
+  _globals['_LIBRARYSERVICE']._serialized_start=2213
+  _globals['_LIBRARYSERVICE']._serialized_end=4061
 # @@protoc_insertion_point(module_scope)
@@ -59,26 +59,51 @@ class LibraryServiceStub(object):
                 request_serializer=library__pb2.SearchRequest.SerializeToString,
                 response_deserializer=library__pb2.Member.FromString,
                 _registered_method=True)
+        self.GetAllMembersBatched = channel.unary_stream(
+                '/library_system.LibraryService/GetAllMembersBatched',
+                request_serializer=library__pb2.SearchRequest.SerializeToString,
+                response_deserializer=library__pb2.MemberBatch.FromString,
+                _registered_method=True)
         self.GetMemberDetail = channel.unary_unary(
                 '/library_system.LibraryService/GetMemberDetail',
                 request_serializer=library__pb2.UserIdRequest.SerializeToString,
                 response_deserializer=library__pb2.Member.FromString,
                 _registered_method=True)
+        self.GetMembers = channel.unary_unary(
+                '/library_system.LibraryService/GetMembers',
+                request_serializer=library__pb2.IdListRequest.SerializeToString,
+                response_deserializer=library__pb2.MemberList.FromString,
+                _registered_method=True)
         self.CreateBook = channel.unary_unary(
                 '/library_system.LibraryService/CreateBook',
                 request_serializer=library__pb2.Book.SerializeToString,
                 response_deserializer=library__pb2.StatusResponse.FromString,
                 _registered_method=True)
+        self.CreateBooks = channel.stream_unary(
+                '/library_system.LibraryService/CreateBooks',
+                request_serializer=library__pb2.Book.SerializeToString,
+                response_deserializer=library__pb2.BulkCreateResponse.FromString,
+                _registered_method=True)
         self.SearchBooks = channel.unary_stream(
                 '/library_system.LibraryService/SearchBooks',
                 request_serializer=library__pb2.SearchRequest.SerializeToString,
                 response_deserializer=library__pb2.Book.FromString,
                 _registered_method=True)
+        self.SearchBooksBatched = channel.unary_stream(
+                '/library_system.LibraryService/SearchBooksBatched',
+                request_serializer=library__pb2.SearchRequest.SerializeToString,
+                response_deserializer=library__pb2.BookBatch.FromString,
+                _registered_method=True)
         self.GetBook = channel.unary_unary(
                 '/library_system.LibraryService/GetBook',
                 request_serializer=library__pb2.SearchRequest.SerializeToString,
                 response_deserializer=library__pb2.Book.FromString,
                 _registered_method=True)
+        self.GetBooks = channel.unary_unary(
+                '/library_system.LibraryService/GetBooks',
+                request_serializer=library__pb2.IdListRequest.SerializeToString,
+                response_deserializer=library__pb2.BookList.FromString,
+                _registered_method=True)
         self.UpdateBookAvailability = channel.unary_unary(
                 '/library_system.LibraryService/UpdateBookAvailability',
                 request_serializer=library__pb2.Book.SerializeToString,
@@ -119,6 +144,16 @@ class LibraryServiceStub(object):
                 request_serializer=library__pb2.UpdateProfileRequest.SerializeToString,
                 response_deserializer=library__pb2.StatusResponse.FromString,
                 _registered_method=True)
+        self.GetLibraryStats = channel.unary_unary(
+                '/library_system.LibraryService/GetLibraryStats',
+                request_serializer=library__pb2.StatsRequest.SerializeToString,
+                response_deserializer=library__pb2.LibraryStats.FromString,
+                _registered_method=True)
+        self.WatchAvailability = channel.unary_stream(
+                '/library_system.LibraryService/WatchAvailability',
+                request_serializer=library__pb2.WatchRequest.SerializeToString,
+                response_deserializer=library__pb2.AvailabilityUpdate.FromString,
+                _registered_method=True)
 
 
 class LibraryServiceServicer(object):
@@ -154,30 +189,60 @@ class LibraryServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetAllMembersBatched(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetMemberDetail(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetMembers(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CreateBook(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def CreateBooks(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SearchBooks(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SearchBooksBatched(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetBook(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetBooks(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def UpdateBookAvailability(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -226,6 +291,18 @@ class LibraryServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetLibraryStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchAvailability(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_LibraryServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -254,26 +331,51 @@ def add_LibraryServiceServicer_to_server(servicer, server):
                     request_deserializer=library__pb2.SearchRequest.FromString,
                     response_serializer=library__pb2.Member.SerializeToString,
             ),
+            'GetAllMembersBatched': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetAllMembersBatched,
+                    request_deserializer=library__pb2.SearchRequest.FromString,
+                    response_serializer=library__pb2.MemberBatch.SerializeToString,
+            ),
             'GetMemberDetail': grpc.unary_unary_rpc_method_handler(
                     servicer.GetMemberDetail,
                     request_deserializer=library__pb2.UserIdRequest.FromString,
                     response_serializer=library__pb2.Member.SerializeToString,
             ),
+            'GetMembers': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetMembers,
+                    request_deserializer=library__pb2.IdListRequest.FromString,
+                    response_serializer=library__pb2.MemberList.SerializeToString,
+            ),
             'CreateBook': grpc.unary_unary_rpc_method_handler(
                     servicer.CreateBook,
                     request_deserializer=library__pb2.Book.FromString,
                     response_serializer=library__pb2.StatusResponse.SerializeToString,
             ),
+            'CreateBooks': grpc.stream_unary_rpc_method_handler(
+                    servicer.CreateBooks,
+                    request_deserializer=library__pb2.Book.FromString,
+                    response_serializer=library__pb2.BulkCreateResponse.SerializeToString,
+            ),
             'SearchBooks': grpc.unary_stream_rpc_method_handler(
                     servicer.SearchBooks,
                     request_deserializer=library__pb2.SearchRequest.FromString,
                     response_serializer=library__pb2.Book.SerializeToString,
             ),
+            'SearchBooksBatched': grpc.unary_stream_rpc_method_handler(
+                    servicer.SearchBooksBatched,
+                    request_deserializer=library__pb2.SearchRequest.FromString,
+                    response_serializer=library__pb2.BookBatch.SerializeToString,
+            ),
             'GetBook': grpc.unary_unary_rpc_method_handler(
                     servicer.GetBook,
                     request_deserializer=library__pb2.SearchRequest.FromString,
                     response_serializer=library__pb2.Book.SerializeToString,
             ),
+            'GetBooks': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetBooks,
+                    request_deserializer=library__pb2.IdListRequest.FromString,
+                    response_serializer=library__pb2.BookList.SerializeToString,
+            ),
             'UpdateBookAvailability': grpc.unary_unary_rpc_method_handler(
                     servicer.UpdateBookAvailability,
                     request_deserializer=library__pb2.Book.FromString,
@@ -314,6 +416,16 @@ def add_LibraryServiceServicer_to_server(servicer, server):
                     request_deserializer=library__pb2.UpdateProfileRequest.FromString,
                     response_serializer=library__pb2.StatusResponse.SerializeToString,
             ),
+            'GetLibraryStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetLibraryStats,
+                    request_deserializer=library__pb2.StatsRequest.FromString,
+                    response_serializer=library__pb2.LibraryStats.SerializeToString,
+            ),
+            'WatchAvailability': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchAvailability,
+                    request_deserializer=library__pb2.WatchRequest.FromString,
+                    response_serializer=library__pb2.AvailabilityUpdate.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'library_system.LibraryService', rpc_method_handlers)
@@ -460,6 +572,33 @@ class LibraryService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetAllMembersBatched(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/library_system.LibraryService/GetAllMembersBatched',
+            library__pb2.SearchRequest.SerializeToString,
+            library__pb2.MemberBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def GetMemberDetail(request,
             target,
@@ -487,6 +626,33 @@ class LibraryService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetMembers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/library_system.LibraryService/GetMembers',
+            library__pb2.IdListRequest.SerializeToString,
+            library__pb2.MemberList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def CreateBook(request,
             target,
@@ -514,6 +680,33 @@ class LibraryService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def CreateBooks(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/library_system.LibraryService/CreateBooks',
+            library__pb2.Book.SerializeToString,
+            library__pb2.BulkCreateResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def SearchBooks(request,
             target,
@@ -541,6 +734,33 @@ class LibraryService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def SearchBooksBatched(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/library_system.LibraryService/SearchBooksBatched',
+            library__pb2.SearchRequest.SerializeToString,
+            library__pb2.BookBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def GetBook(request,
             target,
@@ -568,6 +788,33 @@ class LibraryService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetBooks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/library_system.LibraryService/GetBooks',
+            library__pb2.IdListRequest.SerializeToString,
+            library__pb2.BookList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def UpdateBookAvailability(request,
             target,
@@ -783,3 +1030,57 @@ class LibraryService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetLibraryStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/library_system.LibraryService/GetLibraryStats',
+            library__pb2.StatsRequest.SerializeToString,
+            library__pb2.LibraryStats.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchAvailability(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/library_system.LibraryService/WatchAvailability',
+            library__pb2.WatchRequest.SerializeToString,
+            library__pb2.AvailabilityUpdate.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
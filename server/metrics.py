@@ -0,0 +1,379 @@
+"""
+Per-RPC metrics for the library gRPC server, exported in Prometheus text
+format.
+
+    LIBRARY_METRICS_PORT=9100 python grpc_handler.py
+    curl http://127.0.0.1:9100/metrics
+
+MetricsInterceptor (thread-pool server) and AsyncMetricsInterceptor
+(grpc.aio) record, per method: calls started, calls in flight, calls
+handled by status code, a latency histogram, messages received and sent,
+a histogram of messages per response stream, and the attempts that are
+client retries (grpc-previous-rpc-attempts header). The metric names follow
+the usual grpc_server_* conventions, so p99 latency is
+
+    histogram_quantile(0.99, rate(grpc_server_handling_seconds_bucket{grpc_method="BorrowBook"}[5m]))
+
+Only the standard library is used: the exporter is a small HTTP server
+thread bound to localhost.
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+
+from interceptor_utils import inner_behavior, method_name, rebuild_handler
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STREAM_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{_format_value(bound)}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {_format_value(self.sum)}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class _MethodMetrics:
+    def __init__(self, rpc_type):
+        self.rpc_type = rpc_type
+        self.started = 0
+        self.retried = 0                      # tentatives avec grpc-previous-rpc-attempts > 0
+        self.in_flight = 0
+        self.handled = {}                     # nom du code -> nombre d'appels
+        self.received = 0
+        self.sent = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.stream_sizes = Histogram(STREAM_BUCKETS) if rpc_type.endswith('server_stream') else None
+
+
+class RpcMetrics:
+    """Thread-safe registry of per-method RPC metrics plus extra gauges."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._gauges = []                     # (préfixe, aide, fonction -> dict)
+
+    def start(self, method, rpc_type, previous_attempts=0):
+        with self._lock:
+            metrics = self._methods.get(method)
+            if metrics is None:
+                metrics = self._methods[method] = _MethodMetrics(rpc_type)
+            metrics.started += 1
+            if previous_attempts:
+                metrics.retried += 1
+            metrics.in_flight += 1
+        return _CallRecord(self, method)
+
+    def _finish(self, method, code, elapsed, received, sent):
+        with self._lock:
+            metrics = self._methods[method]
+            metrics.in_flight -= 1
+            metrics.handled[code.name] = metrics.handled.get(code.name, 0) + 1
+            metrics.received += received
+            metrics.sent += sent
+            metrics.latency.observe(elapsed)
+            if metrics.stream_sizes is not None:
+                metrics.stream_sizes.observe(sent)
+
+    def register_stats(self, prefix, help_text, stats):
+        """Exporte chaque clé du dict renvoyé par `stats()` comme jauge `<prefix>_<clé>`."""
+        self._gauges.append((prefix, help_text, stats))
+
+    def render(self):
+        with self._lock:
+            methods = sorted(self._methods.items())
+            lines = []
+            self._render_counter(lines, methods, 'grpc_server_started_total',
+                                 "RPCs started on the server.", lambda m: m.started)
+            self._render_counter(lines, methods, 'grpc_server_retried_total',
+                                 "RPC attempts that are client retries (grpc-previous-rpc-attempts).",
+                                 lambda m: m.retried)
+            self._render_counter(lines, methods, 'grpc_server_msg_received_total',
+                                 "Messages received from clients.", lambda m: m.received)
+            self._render_counter(lines, methods, 'grpc_server_msg_sent_total',
+                                 "Messages sent to clients.", lambda m: m.sent)
+            lines.append("# HELP grpc_server_in_flight RPCs currently being handled.")
+            lines.append("# TYPE grpc_server_in_flight gauge")
+            for method, metrics in methods:
+                lines.append(f'grpc_server_in_flight{{{_labels(method, metrics)}}} {metrics.in_flight}')
+            lines.append("# HELP grpc_server_handled_total RPCs completed on the server, by status code.")
+            lines.append("# TYPE grpc_server_handled_total counter")
+            for method, metrics in methods:
+                for code, count in sorted(metrics.handled.items()):
+                    lines.append(f'grpc_server_handled_total{{{_labels(method, metrics)},grpc_code="{code}"}} {count}')
+            lines.append("# HELP grpc_server_handling_seconds Latency of RPCs handled by the server.")
+            lines.append("# TYPE grpc_server_handling_seconds histogram")
+            for method, metrics in methods:
+                lines.extend(metrics.latency.samples('grpc_server_handling_seconds', _labels(method, metrics)))
+            lines.append("# HELP grpc_server_stream_msgs_sent Messages sent per response stream.")
+            lines.append("# TYPE grpc_server_stream_msgs_sent histogram")
+            for method, metrics in methods:
+                if metrics.stream_sizes is not None:
+                    lines.extend(metrics.stream_sizes.samples('grpc_server_stream_msgs_sent', _labels(method, metrics)))
+        for prefix, help_text, stats in self._gauges:
+            try:
+                values = stats()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# HELP {prefix}_{key} {help_text}")
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {_format_value(value)}")
+        lines.append('')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _render_counter(lines, methods, name, help_text, value):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for method, metrics in methods:
+            lines.append(f'{name}{{{_labels(method, metrics)}}} {value(metrics)}')
+
+
+def _labels(method, metrics):
+    return f'grpc_service="library_system.LibraryService",grpc_method="{method}",grpc_type="{metrics.rpc_type}"'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class _CallRecord:
+    """Mesures d'un appel en cours ; finish() n'est pris en compte qu'une fois."""
+
+    def __init__(self, registry, method):
+        self._registry = registry
+        self._method = method
+        self._started_at = time.perf_counter()
+        self._done = False
+        self.received = 0
+        self.sent = 0
+
+    def finish(self, code):
+        if self._done:
+            return
+        self._done = True
+        self._registry._finish(self._method, code, time.perf_counter() - self._started_at,
+                               self.received, self.sent)
+
+
+METRICS = RpcMetrics()
+
+
+def _status(context, failed=False):
+    """Code de statut final : fixé par abort()/set_code(), sinon OK ou UNKNOWN (exception)."""
+    try:
+        code = context.code()
+    except Exception:
+        code = None
+    if isinstance(code, grpc.StatusCode):
+        return code
+    return grpc.StatusCode.UNKNOWN if failed else grpc.StatusCode.OK
+
+
+def _previous_attempts(handler_call_details):
+    """Nombre de tentatives précédentes, envoyé par le client gRPC quand il rejoue un appel."""
+    for key, value in handler_call_details.invocation_metadata or ():
+        if key == 'grpc-previous-rpc-attempts':
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
+
+
+def _rpc_type(handler):
+    if handler.request_streaming and handler.response_streaming:
+        return 'bidi_stream'
+    if handler.request_streaming:
+        return 'client_stream'
+    if handler.response_streaming:
+        return 'server_stream'
+    return 'unary'
+
+
+# ----------------------------------------------------
+# Thread-pool server
+# ----------------------------------------------------
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    def __init__(self, registry=METRICS):
+        self.registry = registry
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = method_name(handler_call_details)
+        rpc_type = _rpc_type(handler)
+        attempts = _previous_attempts(handler_call_details)
+        inner = inner_behavior(handler)
+        registry = self.registry
+
+        def count_requests(request_iterator, call):
+            for request in request_iterator:
+                call.received += 1
+                yield request
+
+        if handler.response_streaming:
+            def behavior(request, context):
+                call = registry.start(method, rpc_type, attempts)
+                if handler.request_streaming:
+                    request = count_requests(request, call)
+                else:
+                    call.received = 1
+                code = None
+                try:
+                    for response in inner(request, context):
+                        call.sent += 1
+                        yield response
+                except GeneratorExit:
+                    code = grpc.StatusCode.CANCELLED
+                    raise
+                except Exception:
+                    code = _status(context, failed=True)
+                    raise
+                finally:
+                    if code is None:
+                        code = _status(context) if context.is_active() else grpc.StatusCode.CANCELLED
+                    call.finish(code)
+        else:
+            def behavior(request, context):
+                call = registry.start(method, rpc_type, attempts)
+                if handler.request_streaming:
+                    request = count_requests(request, call)
+                else:
+                    call.received = 1
+                try:
+                    response = inner(request, context)
+                except Exception:
+                    call.finish(_status(context, failed=True))
+                    raise
+                call.sent = 1
+                call.finish(_status(context))
+                return response
+
+        return rebuild_handler(handler, behavior)
+
+
+# ----------------------------------------------------
+# grpc.aio server
+# ----------------------------------------------------
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    def __init__(self, registry=METRICS):
+        self.registry = registry
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = method_name(handler_call_details)
+        rpc_type = _rpc_type(handler)
+        attempts = _previous_attempts(handler_call_details)
+        inner = inner_behavior(handler)
+        registry = self.registry
+
+        async def count_requests(request_iterator, call):
+            async for request in request_iterator:
+                call.received += 1
+                yield request
+
+        if handler.response_streaming:
+            async def behavior(request, context):
+                call = registry.start(method, rpc_type, attempts)
+                if handler.request_streaming:
+                    request = count_requests(request, call)
+                else:
+                    call.received = 1
+                code = None
+                try:
+                    async for response in inner(request, context):
+                        call.sent += 1
+                        yield response
+                except (GeneratorExit, asyncio.CancelledError):
+                    code = grpc.StatusCode.CANCELLED
+                    raise
+                except BaseException:
+                    code = _status(context, failed=True)
+                    raise
+                finally:
+                    call.finish(code or _status(context))
+        else:
+            async def behavior(request, context):
+                call = registry.start(method, rpc_type, attempts)
+                if handler.request_streaming:
+                    request = count_requests(request, call)
+                else:
+                    call.received = 1
+                try:
+                    response = await inner(request, context)
+                except asyncio.CancelledError:
+                    call.finish(grpc.StatusCode.CANCELLED)
+                    raise
+                except BaseException:
+                    call.finish(_status(context, failed=True))
+                    raise
+                call.sent = 1
+                call.finish(_status(context))
+                return response
+
+        return rebuild_handler(handler, behavior)
+
+
+# ----------------------------------------------------
+# HTTP exporter
+# ----------------------------------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = METRICS
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='127.0.0.1', registry=METRICS):
+    """Sert `registry` sur http://host:port/metrics dans un thread démon ; retourne le serveur HTTP."""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name='metrics-http', daemon=True).start()
+    return httpd
@@ -0,0 +1,146 @@
+"""
+Pre-fork launcher for the library gRPC server.
+
+    python prefork.py --workers 4 [--aio] [--address [::]:50051] [--metrics-port 9100]
+
+Starts N worker processes that all bind the same port with SO_REUSEPORT;
+the kernel spreads incoming connections across them, so protobuf
+serialization and ORM work scale with the number of cores instead of
+being capped by one GIL. Each worker runs its own LibraryServicer (and
+its own search index and GetBook cache). The launcher supervises the workers and restarts
+any that exit, backing off when a worker keeps crashing on start-up.
+With --metrics-port P, worker i exports its metrics on port P + i.
+
+Writes only invalidate the GetBook cache of the worker that handled them:
+in the other workers a modified book stays visible for up to
+LIBRARY_BOOK_CACHE_TTL seconds, so the launcher lowers its default to
+DEFAULT_BOOK_CACHE_TTL (and rebuilds each search index every
+LIBRARY_SEARCH_INDEX_REFRESH seconds). LIBRARY_BOOK_CACHE_TTL=0 disables
+the cache.
+
+Workers are started with the "spawn" method: gRPC must not be initialized
+in the parent before forking, so this module never imports grpc or Django.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+# Un worker mort moins de N secondes après son démarrage est considéré
+# comme en boucle de crash : on espace les redémarrages.
+MIN_HEALTHY_UPTIME = 10
+MAX_RESTART_DELAY = 30
+POLL_INTERVAL = 1.0
+# Sans index partagé, chaque worker reconstruit le sien à cet intervalle (s).
+DEFAULT_INDEX_REFRESH = 60
+# Cache GetBook propre à chaque worker : l'écriture d'un autre worker y reste
+# invisible jusqu'à l'expiration de l'entrée (30 s hors prefork).
+DEFAULT_BOOK_CACHE_TTL = 2
+
+
+def _worker_main(address, use_aio, metrics_port):
+    try:
+        if use_aio:
+            import asyncio
+            import aio_server
+            asyncio.run(aio_server.serve_async(address, reuse_port=True, metrics_port=metrics_port))
+        else:
+            import grpc_handler
+            grpc_handler.serve(address, reuse_port=True, metrics_port=metrics_port)
+    except KeyboardInterrupt:
+        pass
+
+
+class Supervisor:
+    def __init__(self, workers, address, use_aio, metrics_port=0):
+        self.workers = workers
+        self.address = address
+        self.use_aio = use_aio
+        self.metrics_port = metrics_port
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = [None] * workers          # index -> Process
+        self._started_at = [0.0] * workers
+        self._restart_delay = [0.0] * workers
+        self._restart_at = [0.0] * workers
+        self._stopping = False
+
+    def _start(self, slot):
+        process = self._context.Process(
+            target=_worker_main, args=(self.address, self.use_aio, self._metrics_port(slot)),
+            name=f'library-grpc-{slot}', daemon=False,
+        )
+        process.start()
+        self._slots[slot] = process
+        self._started_at[slot] = time.monotonic()
+        print(f"[prefork] worker {slot} démarré (pid {process.pid})")
+
+    def _metrics_port(self, slot):
+        # Un port par emplacement : il reste stable quand le worker est redémarré.
+        return self.metrics_port + slot if self.metrics_port else 0
+
+    def _check(self, slot):
+        process = self._slots[slot]
+        now = time.monotonic()
+        if process is not None:
+            if process.is_alive():
+                if now - self._started_at[slot] >= MIN_HEALTHY_UPTIME:
+                    self._restart_delay[slot] = 0.0
+                return
+            process.join()
+            uptime = now - self._started_at[slot]
+            if uptime < MIN_HEALTHY_UPTIME:
+                self._restart_delay[slot] = min(MAX_RESTART_DELAY, max(1.0, self._restart_delay[slot] * 2))
+            print(f"[prefork] worker {slot} (pid {process.pid}) terminé avec le code {process.exitcode} "
+                  f"après {uptime:.1f}s ; redémarrage dans {self._restart_delay[slot]:.0f}s")
+            self._slots[slot] = None
+            self._restart_at[slot] = now + self._restart_delay[slot]
+        if now >= self._restart_at[slot]:
+            self._start(slot)
+
+    def _handle_signal(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+        os.environ.setdefault('LIBRARY_SEARCH_INDEX_REFRESH', str(DEFAULT_INDEX_REFRESH))
+        os.environ.setdefault('LIBRARY_BOOK_CACHE_TTL', str(DEFAULT_BOOK_CACHE_TTL))
+        for slot in range(self.workers):
+            self._start(slot)
+        print(f"✅ {self.workers} workers gRPC sur {self.address} (SO_REUSEPORT)")
+        while not self._stopping:
+            time.sleep(POLL_INTERVAL)
+            for slot in range(self.workers):
+                if not self._stopping:
+                    self._check(slot)
+        self.shutdown()
+
+    def shutdown(self, timeout=10):
+        print("\n🛑 Arrêt des workers...")
+        running = [p for p in self._slots if p is not None and p.is_alive()]
+        for process in running:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in running:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lance plusieurs workers gRPC sur le même port.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--address', default='[::]:50051')
+    parser.add_argument('--aio', action='store_true', help="workers grpc.aio (aio_server.py)")
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help="premier port /metrics ; le worker i utilise ce port + i (0 = désactivé)")
+    args = parser.parse_args(argv)
+    Supervisor(max(1, args.workers), args.address, args.aio, args.metrics_port).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
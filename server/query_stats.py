@@ -0,0 +1,222 @@
+"""
+Opt-in SQL query accounting per gRPC call.
+
+    LIBRARY_QUERY_STATS=1 python grpc_handler.py
+
+Every query run on behalf of an RPC is counted and timed through a Django
+execute_wrapper. The totals are attached to the call's trailing metadata
+(x-query-count, x-query-time-ms) so the Django client can show them in
+DEBUG, and a warning is logged when the same statement shape runs again
+and again within one call: the signature of an N+1 (a lazy foreign key or
+a per-row query inside a loop), whose cost grows with the result size.
+Queries repeated by design, one per chunk of rows (keyset continuations,
+id IN (...) fetches, bulk insert batches), run under chunked_queries():
+they are counted and timed but not reported.
+
+The collector of the current call lives in a ContextVar. The aio server
+copies the context into its executor threads (see aio_server._call), so
+queries made there are attributed to the right call as well.
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+import grpc
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from interceptor_utils import inner_behavior, method_name, rebuild_handler
+
+QUERY_COUNT_KEY = 'x-query-count'
+QUERY_TIME_KEY = 'x-query-time-ms'
+
+# Nombre d'exécutions d'une même requête (à paramètres près) au-delà duquel on signale un N+1.
+REPEAT_THRESHOLD = int(os.environ.get('LIBRARY_QUERY_REPEAT_THRESHOLD', '5'))
+
+logger = logging.getLogger('library.queries')
+
+_current = contextvars.ContextVar('library_query_collector', default=None)
+_chunked = contextvars.ContextVar('library_query_chunked', default=False)
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_enabled = False
+
+
+def normalize_sql(sql):
+    """Forme d'une requête : littéraux et listes IN de longueur variable remplacés."""
+    return _LITERAL_RE.sub('?', _IN_LIST_RE.sub('IN (...)', sql))
+
+
+@contextlib.contextmanager
+def chunked_queries():
+    """
+    Requêtes exécutées une fois par lot de lignes, et non par ligne : exclues
+    de la détection des N+1. Utilisable aussi comme décorateur.
+    """
+    token = _chunked.set(True)
+    try:
+        yield
+    finally:
+        _chunked.reset(token)
+
+
+class QueryCollector:
+    """Queries run for one RPC."""
+
+    def __init__(self, method):
+        self.method = method
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, sql, seconds, chunked=False):
+        self.count += 1
+        self.seconds += seconds
+        if not chunked:
+            self.shapes[normalize_sql(sql)] += 1
+
+    def trailing_metadata(self):
+        return ((QUERY_COUNT_KEY, str(self.count)), (QUERY_TIME_KEY, f"{self.seconds * 1000:.1f}"))
+
+    def report(self, messages):
+        repeated = [(shape, n) for shape, n in self.shapes.most_common(3) if n >= REPEAT_THRESHOLD]
+        if repeated:
+            shape, n = repeated[0]
+            logger.warning("N+1 probable dans %s : %d requêtes (%.1f ms) pour %d message(s) ; "
+                           "%d× « %s »", self.method, self.count, self.seconds * 1000, messages, n, shape)
+
+
+def _record_query(execute, sql, params, many, context):
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.record(sql, time.perf_counter() - started, _chunked.get())
+
+
+def _install_wrapper(sender=None, connection=None, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def enable_query_stats():
+    """Installe le compteur sur chaque connexion (présente et à venir) de chaque thread."""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    connection_created.connect(_install_wrapper, dispatch_uid='library_query_stats')
+    _install_wrapper(connection=connection)
+
+
+class _MetadataContext:
+    """
+    Servicer context proxy: trailing metadata set by the servicer (page
+    tokens) is kept and sent together with the query counts at the end.
+    """
+    def __init__(self, context):
+        self._context = context
+        self.trailing = ()
+
+    def set_trailing_metadata(self, trailing_metadata):
+        self.trailing = tuple(trailing_metadata)
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+def _finish(collector, proxy, context, messages):
+    context.set_trailing_metadata(proxy.trailing + collector.trailing_metadata())
+    collector.report(messages)
+
+
+class QueryStatsInterceptor(grpc.ServerInterceptor):
+    """Thread-pool server: the collector is set around each step of the handler."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = method_name(handler_call_details)
+        inner = inner_behavior(handler)
+
+        if handler.response_streaming:
+            def behavior(request, context):
+                collector = QueryCollector(method)
+                proxy = _MetadataContext(context)
+                token = _current.set(collector)
+                try:
+                    responses = iter(inner(request, proxy))
+                finally:
+                    _current.reset(token)
+                sent = 0
+                try:
+                    while True:
+                        # Le collecteur n'est actif que pendant l'exécution du servicer.
+                        token = _current.set(collector)
+                        try:
+                            response = next(responses)
+                        except StopIteration:
+                            break
+                        finally:
+                            _current.reset(token)
+                        sent += 1
+                        yield response
+                finally:
+                    _finish(collector, proxy, context, sent)
+        else:
+            def behavior(request, context):
+                collector = QueryCollector(method)
+                proxy = _MetadataContext(context)
+                token = _current.set(collector)
+                try:
+                    return inner(request, proxy)
+                finally:
+                    _current.reset(token)
+                    _finish(collector, proxy, context, 1)
+
+        return rebuild_handler(handler, behavior)
+
+
+class AsyncQueryStatsInterceptor(grpc.aio.ServerInterceptor):
+    """grpc.aio server: each RPC runs in its own task, hence its own context."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = method_name(handler_call_details)
+        inner = inner_behavior(handler)
+
+        if handler.response_streaming:
+            async def behavior(request, context):
+                collector = QueryCollector(method)
+                proxy = _MetadataContext(context)
+                _current.set(collector)
+                sent = 0
+                try:
+                    async for response in inner(request, proxy):
+                        sent += 1
+                        yield response
+                finally:
+                    _finish(collector, proxy, context, sent)
+        else:
+            async def behavior(request, context):
+                collector = QueryCollector(method)
+                proxy = _MetadataContext(context)
+                _current.set(collector)
+                try:
+                    return await inner(request, proxy)
+                finally:
+                    _finish(collector, proxy, context, 1)
+
+        return rebuild_handler(handler, behavior)
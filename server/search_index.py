@@ -0,0 +1,176 @@
+"""
+In-process inverted index behind the SearchBooks RPC.
+
+Titles, authors and ISBNs are normalized (lower case, accents stripped)
+and split into tokens. Each token maps to the books that contain it, so a
+query only touches the postings of its own terms instead of scanning the
+whole `Book` table with LIKE '%q%'. Every query term must match (AND);
+terms also match as prefixes so partially typed words still find results.
+Results are ranked by field weight (title > author > isbn), an exact word
+scoring above a prefix. The score of a book depends only on its own
+fields, not on corpus statistics such as IDF: a ranked page cursor stays
+valid when other books are added or the index is rebuilt between pages.
+
+The index lives in the server process: it is built from the database on
+first use and kept in sync by the servicer's write RPCs.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+FIELD_WEIGHTS = (('title', 3.0), ('author', 2.0), ('isbn', 1.0))
+
+# Un préfixe trop court (« a ») toucherait une grande partie du vocabulaire.
+MIN_PREFIX_LENGTH = 2
+PREFIX_PENALTY = 0.6
+# Borne supérieure des tokens d'un préfixe : les tokens ne contiennent que [a-z0-9].
+_PREFIX_END = '{'
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Minuscules sans accents : « Éléonore » et « eleonore » sont le même mot."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+class BookSearchIndex:
+    """Thread-safe inverted index of (title, author, isbn) keyed by book id."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}                       # book_id -> (title, author, isbn)
+        self._sort_titles = {}                # book_id -> normalized title (tie-break)
+        self._postings = {}                   # token -> {book_id: weight}
+        self._vocab = []                      # tokens triés, pour les recherches par préfixe
+        self.ready = False
+
+    # --- Maintenance ---
+    def rebuild(self, rows):
+        """Reconstruit l'index à partir d'un itérable de (id, title, author, isbn)."""
+        fresh = BookSearchIndex()
+        for book_id, title, author, isbn in rows:
+            fresh._add(book_id, (title or '', author or '', isbn or ''), sort_vocab=False)
+        fresh._vocab.sort()
+        with self._lock:
+            self._docs = fresh._docs
+            self._sort_titles = fresh._sort_titles
+            self._postings = fresh._postings
+            self._vocab = fresh._vocab
+            self.ready = True
+
+    def ensure_built(self, loader):
+        """Construit l'index au premier usage ; `loader` renvoie les lignes à indexer."""
+        if self.ready:
+            return
+        with self._lock:
+            if not self.ready:
+                self.rebuild(loader())
+
+    def upsert(self, book_id, title=None, author=None, isbn=None):
+        """Indexe ou réindexe un livre ; les champs à None gardent leur valeur indexée."""
+        with self._lock:
+            old = self._docs.get(book_id, ('', '', ''))
+            doc = tuple(old[i] if value is None else value for i, value in enumerate((title, author, isbn)))
+            self._discard(book_id)
+            self._add(book_id, doc)
+
+    def remove(self, book_id):
+        with self._lock:
+            self._discard(book_id)
+
+    def __len__(self):
+        return len(self._docs)
+
+    # --- Query ---
+    def search(self, query, after=None, limit=None):
+        """
+        Renvoie les clés de tri `(-score, titre normalisé, id)` des livres qui
+        correspondent à tous les termes de `query`, dans l'ordre du classement.
+        `after` est la dernière clé déjà servie (pagination par curseur).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            scores = None
+            for term in terms:
+                matches = self._match_term(term)
+                if not matches:
+                    return []
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {book_id: score + matches[book_id]
+                              for book_id, score in scores.items() if book_id in matches}
+                    if not scores:
+                        return []
+            keys = ((-score, self._sort_titles[book_id], book_id) for book_id, score in scores.items())
+            if after is not None:
+                after = tuple(after)
+                keys = (key for key in keys if key > after)
+            if limit:
+                return heapq.nsmallest(limit, keys)
+            return sorted(keys)
+
+    # --- Internals (appelés sous self._lock) ---
+    def _match_term(self, term):
+        """
+        Score par livre pour un terme : correspondance exacte, puis tous les
+        tokens qui le prolongent (aucun n'est écarté, quel que soit leur nombre :
+        le coût reste celui des livres trouvés).
+        """
+        matches = {}
+        tokens = [(term, 1.0)] if term in self._postings else []
+        if len(term) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_right(self._vocab, term)
+            end = bisect.bisect_left(self._vocab, term + _PREFIX_END, start)
+            tokens.extend((token, PREFIX_PENALTY) for token in self._vocab[start:end])
+        for token, factor in tokens:
+            for book_id, weight in self._postings[token].items():
+                score = weight * factor
+                if score > matches.get(book_id, 0.0):
+                    matches[book_id] = score
+        return matches
+
+    def _add(self, book_id, doc, sort_vocab=True):
+        self._docs[book_id] = doc
+        self._sort_titles[book_id] = normalize(doc[0])
+        weights = defaultdict(float)
+        for (_, field_weight), text in zip(FIELD_WEIGHTS, doc):
+            for token in set(tokenize(text)):
+                weights[token] += field_weight
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if sort_vocab:
+                    bisect.insort(self._vocab, token)
+                else:
+                    self._vocab.append(token)
+            postings[book_id] = weight
+
+    def _discard(self, book_id):
+        doc = self._docs.pop(book_id, None)
+        if doc is None:
+            return
+        self._sort_titles.pop(book_id, None)
+        for token in set(tokenize(' '.join(doc))):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(book_id, None)
+            if not postings:
+                del self._postings[token]
+                index = bisect.bisect_left(self._vocab, token)
+                if index < len(self._vocab) and self._vocab[index] == token:
+                    del self._vocab[index]